@@ -0,0 +1,54 @@
+import pandas as pd
+
+from scoring import valuation_multiplier
+
+# --- PROMPT CONTEXT ---
+# Built here rather than in app.py so every caller (the app, the background warmer) sends byte-identical
+# prompts and so shares the same LLM cache entries.
+
+def fmt_num(val, is_pct=False, is_currency=False):
+    if val is None or val == "N/A": return "-"
+    if is_pct: return f"{val * 100:.2f}%"
+    if is_currency:
+        if val > 1e12: return f"{val/1e12:.2f}T"
+        if val > 1e9: return f"{val/1e9:.2f}B"
+        if val > 1e6: return f"{val/1e6:.2f}M"
+    return f"{val:.2f}"
+
+def valuation_context(data):
+    # ValuationSummary prompt context from a load_core result.
+    # The range is labelled with the span it actually covers, which can be shorter than five years.
+    pe, min_pe, max_pe = data['pe'], data['min_pe'], data['max_pe']
+    _, pos_pct = valuation_multiplier(pe, min_pe, max_pe)
+    years = f"{data.get('pe_years') or 0:.1f}-Year"
+    label = "Trailing PE" if data.get('pe_basis') == "ttm" else "Forward PE"
+    context = f"{label}: {pe:.2f}. {years} Lowest PE: {min_pe:.2f}. {years} Highest PE: {max_pe:.2f}. Current Position: {pos_pct*100:.1f}% (0% is Low/Cheap, 100% is High/Expensive)."
+    if data.get('pe_pct') is not None: context += f" Historical PE percentile: {data['pe_pct']*100:.0f}%."
+    return context
+
+def earnings_context(news_data):
+    # Latest reported earnings plus headlines, shared by the News tab and the EarningsSummary prompt.
+    latest_earnings = None; earn_date = "N/A"; act_eps = None
+    ed = news_data['earnings_dates']
+    if ed is not None and not ed.empty:
+        now = pd.Timestamp.now(tz=ed.index.tz)
+        past_earnings = ed[ed.index < now]
+        if not past_earnings.empty:
+            latest_earnings = past_earnings.iloc[0]; earn_date = past_earnings.index[0].strftime('%Y-%m-%d')
+            act_eps = latest_earnings.get('Reported EPS')
+
+    q_stmt = news_data['quarterly_financials']
+    q_rev_disp = "N/A"
+    if q_stmt is not None and not q_stmt.empty and q_stmt.shape[1] > 0:
+        try: q_rev_disp = fmt_num(q_stmt.iloc[:, 0].get('Total Revenue'), is_currency=True)
+        except: pass
+
+    news_text = ""
+    if news_data['news']:
+        for n in news_data['news'][:5]: news_text += f"- {n.get('title', 'No Title')}\n"
+
+    earn_context = f"Last Earnings Date: {earn_date}. Reported EPS: {act_eps if pd.notna(act_eps) else 'N/A'}. Revenue: {q_rev_disp}."
+    return {
+        "latest_earnings": latest_earnings, "earn_date": earn_date, "act_eps": act_eps,
+        "prompt_context": f"{earn_context}\nRecent Headlines:\n{news_text}",
+    }
@@ -1,14 +1,30 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import numpy as np
 from datetime import datetime
-import re
-import requests
-from groq import Groq
+import time
+import os
+import queue
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from analysis import earnings_context, fmt_num, valuation_context
+from backtest import HORIZONS, backtest
+from charts import long_range_frame
+from groq_client import breaker, get_client
+from llm import ANALYSIS_DEADLINE, PRIMARY_MODEL, SCORING_MODES, analyze_qualitative, cached_topic_score, llm_cache, score_topic, score_topics_batched
+from perf import Tally, recorder, span, start_metrics_server
+from market_data import load_core, load_financials, load_news, market_cache
+from snapshot import snapshots
+from score_history import input_fingerprints, score_history
+from scoring import QUAL_TOPICS, heuristic_topic_score, normalize_ticker, qual_total, valuation_multiplier, grade_key, technical_action
+from screener import SCREENER_MAX_TICKERS, parse_watchlist, run_screener
+from session_store import SessionResults, resolved
+from singleflight import stats as flight_stats
+from warmer import WARM_IN_SERVER, start_background
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(page_title="Value Investor Pro", layout="wide", page_icon="📈")
+# Serves /metrics when VIP_METRICS_PORT is set; only the app process serves it.
+start_metrics_server()
 
 # --- SESSION STATE & TRANSLATION SETUP ---
 if 'language' not in st.session_state:
@@ -25,6 +41,13 @@ T = {
         "ticker_label": "Enter Stock Ticker",
         "analyze_btn": "Analyze Stock",
         "analyze_mobile_btn": "Analyze (Mobile)",
+        "mode_label": "Mode",
+        "mode_single": "Single Stock",
+        "mode_screener": "Watchlist Screener",
+        "mode_backtest": "Backtest",
+        "scoring_mode": "AI Scoring Mode",
+        "scoring_batched": "Batched (1 request)",
+        "scoring_per_topic": "Per topic (5 requests)",
         
         # Methodology
         "methodology": "Methodology:",
@@ -44,6 +67,10 @@ T = {
         # Loading
         "loading_data": "Fetching data for",
         "loading_ai": "AI Analyzing:",
+        "loading_tab": "Loading...",
+        "perf_toggle": "⏱️ Performance",
+        "breaker_open": "Primary model unavailable; using backup for {secs}s.",
+        "perf_empty": "No timings recorded yet.",
         "currency": "Currency",
         "industry": "Industry",
         
@@ -55,20 +82,27 @@ T = {
         "pe_ratio": "Forward PE",
         "multiplier_label": "Valuation Multiplier",
         "calc_qual": "Qualitative Score",
+        "fallback_cached": "Cached AI answer shown while a fresh one is requested.",
+        "fallback_estimate": "Quick estimate while the AI answer is pending.",
+        "fallback_reason": "{metric}: {value}", "fallback_reason_missing": "{metric} not available; neutral score.",
+        "score_provisional": "Includes estimated topic scores; updates when the AI answers arrive.",
+        "rev_growth": "Revenue Growth",
         "calc_mult": "Multiplier",
+        "score_history": "📈 Score over time", "final_score_lbl": "Final score",
+        "score_history_note": "One point per day this ticker was analysed.",
         "calc_result": "Final Score",
         "score_calc_title": "VALUE SCORE CALCULATION",
-        "hist_low_pe": "Hist. Low PE (5Y)",
-        "hist_high_pe": "Hist. High PE (5Y)",
-        "pe_pos": "PE Position (5Y)",
         "pe_pos_low": "Low (Cheap)",
+        "pe_pctile": "Percentile",
+        "pe_basis_ttm": "Historical PE uses trailing-twelve-month EPS from quarterly reports, over the span they cover; the position uses the trailing PE.",
+        "pe_basis_current_eps": "Quarterly reports cover too little of the last five years: historical PE and the position use today's forward EPS.",
         "pe_pos_high": "High (Expensive)",
         "val_ai_analysis": "AI Valuation Insight", # NEW
         
         # Multiplier Explanation
         "mult_how": "❓ How is this calculated?",
         "mult_exp_title": "Logic: Buy Low, Sell High",
-        "mult_exp_desc": "We compare the current PE to its 5-year range. Lower PE (Cheap) gets a higher multiplier to boost the score.",
+        "mult_exp_desc": "We compare the PE to its historical range over the last {years:.1f} years (the PE Range note gives the EPS basis). Lower PE (Cheap) gets a higher multiplier to boost the score.",
         "mult_formula": "Position Formula:",
         "mult_table_pos": "PE Position",
         "mult_table_mult": "Multiplier",
@@ -88,6 +122,7 @@ T = {
         # Technicals
         "tech_verdict": "Technical Verdict", "reason": "Reason",
         "support": "Support", "resistance": "Resistance", "trend": "Trend", "squeeze": "Squeeze",
+        "long_range": "Full history", "long_range_note": "{shown} of {total} daily bars plotted (LTTB downsampled); PE band at the {years:.1f}-year low/high PE.",
         "lbl_rsi": "RSI (14)", "lbl_vol": "Vol Ratio",
         "status_high": "High", "status_low": "Low", "status_ok": "OK",
         "uptrend": "Uptrend", "downtrend": "Downtrend", "weak_uptrend": "Weak Uptrend", "neutral": "Neutral",
@@ -129,7 +164,27 @@ T = {
         "reas_sup": "Uptrend + Near Support.", "reas_vol": "Uptrend + High Volume.",
         "reas_vcp": "Volatility Squeeze detected.", "reas_over": "Uptrend but Overbought.",
         "reas_health": "Healthy Uptrend.", "reas_break_sup": "Breaking below Support.",
-        "reas_oversold": "Potential oversold bounce.", "reas_down": "Stock is in a Downtrend."
+        "reas_oversold": "Potential oversold bounce.", "reas_down": "Stock is in a Downtrend.",
+
+        # Screener
+        "scr_header": "📋 Watchlist Screener",
+        "scr_watchlist": "Tickers (comma, space or one per line)",
+        "scr_ai": "Run AI qualitative scoring for uncached tickers (slow)",
+        "scr_run": "Run Screener",
+        "scr_progress": "Scored",
+        "scr_too_many": "Only the first {n} tickers will be screened.",
+        "scr_empty": "No ticker could be scored.",
+        "scr_note": "Final Score needs all 5 AI topic scores; without AI scoring only previously analyzed tickers get one.",
+        "col_ticker": "Ticker", "col_name": "Name", "col_pe": "PE", "col_pe_low": "PE Low", "col_pe_high": "PE High",
+        "col_pe_pos": "PE Position %", "col_action": "Technical Verdict", "col_qual": "Qual. (0-20)", "col_grade": "Grade",
+        # Backtest
+        "bt_header": "🧪 Technical Rules Backtest",
+        "bt_tickers": "Tickers (blank: every ticker with stored history)",
+        "bt_run": "Run Backtest",
+        "bt_empty": "No stored history with enough bars. Analyze or screen some tickers first.",
+        "bt_note": "Every stored day of every ticker gets the Technical tab's verdict. Returns are over the next N trading days. Hit rate is the share of days the price moved in the verdict's direction (up for buy/hold/watch, down for avoid/sell/take-profit). The All row's hit rate is the share of up moves.",
+        "bt_done": "{tickers} tickers, {days:,} ticker-days",
+        "col_days": "Days", "col_share": "Share %", "col_ret": "Avg Return {h}d %", "col_hit": "Hit Rate {h}d %", "bt_all": "All days"
     },
     "CN": {
         "sidebar_title": "股票分析工具",
@@ -137,6 +192,13 @@ T = {
         "ticker_label": "輸入股票代號",
         "analyze_btn": "開始分析",
         "analyze_mobile_btn": "開始分析 (手機版)",
+        "mode_label": "模式",
+        "mode_single": "單一股票",
+        "mode_screener": "自選股篩選",
+        "mode_backtest": "回測",
+        "scoring_mode": "AI 評分模式",
+        "scoring_batched": "批次 (1 次請求)",
+        "scoring_per_topic": "逐個主題 (5 次請求)",
         
         "methodology": "分析方法:",
         "qual_score": "定性評分 (0-20)",
@@ -152,6 +214,10 @@ T = {
         "topics": ["獨特產品/護城河", "營收增長潛力", "競爭優勢", "獲利穩定性", "管理層質素"],
         "loading_data": "正在獲取數據：",
         "loading_ai": "AI 正在分析：",
+        "loading_tab": "載入中...",
+        "perf_toggle": "⏱️ 效能",
+        "breaker_open": "主模型暫不可用，{secs} 秒內使用備用模型。",
+        "perf_empty": "暫無計時數據。",
         "currency": "貨幣",
         "industry": "行業",
         "val_analysis_header": "1. 定性分析 (AI)",
@@ -162,21 +228,28 @@ T = {
         "multiplier_label": "本益比乘數 (Multiplier)",
         
         "calc_qual": "投資評估分數",
+        "fallback_cached": "先顯示快取的 AI 答案，正在取得最新答案。",
+        "fallback_estimate": "AI 答案未到，先顯示快速估算。",
+        "fallback_reason": "{metric}：{value}", "fallback_reason_missing": "沒有{metric}數據，給予中性分數。",
+        "score_provisional": "包含估算的主題分數，AI 答案到達後會更新。",
+        "rev_growth": "營收增長",
         "calc_mult": "本益比乘數",
+        "score_history": "📈 評分走勢", "final_score_lbl": "最終評分",
+        "score_history_note": "每個分析日一個數據點。",
         "calc_result": "最終評分",
         "score_calc_title": "價值評分計算",
 
-        "hist_low_pe": "歷史最低 PE (5年)",
-        "hist_high_pe": "歷史最高 PE (5年)",
-        "pe_pos": "目前 PE 位置區間",
         "pe_pos_low": "低位 (便宜)",
+        "pe_pctile": "百分位",
+        "pe_basis_ttm": "歷史市盈率以季度報告的過去十二個月每股盈利計算，只涵蓋報告覆蓋的期間；位置以歷史市盈率 (Trailing) 計算。",
+        "pe_basis_current_eps": "季度報告未能涵蓋過去五年的大部分期間：歷史市盈率及位置以當前預測每股盈利計算。",
         "pe_pos_high": "高位 (昂貴)",
         "val_ai_analysis": "AI 估值分析", # NEW
 
         # Multiplier Explanation
         "mult_how": "❓ 如何計算此倍數？",
         "mult_exp_title": "邏輯：低買高賣",
-        "mult_exp_desc": "我們將當前 PE 與過去 5 年的歷史區間進行比較。PE 越低（便宜）則倍數越高，從而提升評分。",
+        "mult_exp_desc": "我們將 PE 與過去 {years:.1f} 年的歷史區間進行比較（每股盈利基礎見 PE 區間說明）。PE 越低（便宜）則倍數越高，從而提升評分。",
         "mult_formula": "位置計算公式：",
         "mult_table_pos": "PE 區間位置",
         "mult_table_mult": "倍數 (Multiplier)",
@@ -194,6 +267,7 @@ T = {
 
         "tech_verdict": "技術面結論", "reason": "理由",
         "support": "支持位", "resistance": "阻力位", "trend": "趨勢", "squeeze": "擠壓 (VCP)",
+        "long_range": "全部歷史", "long_range_note": "繪製 {total} 個交易日中的 {shown} 個 (LTTB 降採樣)；市盈率帶為 {years:.1f} 年最低/最高市盈率。",
         "lbl_rsi": "相對強弱指數", "lbl_vol": "成交量比率",
         "status_high": "偏高", "status_low": "偏低", "status_ok": "適中",
         "uptrend": "上升趨勢", "downtrend": "下降趨勢", "weak_uptrend": "弱勢上升", "neutral": "中性",
@@ -233,7 +307,25 @@ T = {
         "reas_sup": "上升趨勢 + 接近支持位。", "reas_vol": "上升趨勢 + 成交量激增。",
         "reas_vcp": "檢測到波動率擠壓 (VCP)。", "reas_over": "上升趨勢但超買。",
         "reas_health": "健康的上升趨勢。", "reas_break_sup": "跌破支持位。",
-        "reas_oversold": "下跌趨勢但可能超賣反彈。", "reas_down": "股價處於下降趨勢。"
+        "reas_oversold": "下跌趨勢但可能超賣反彈。", "reas_down": "股價處於下降趨勢。",
+
+        "scr_header": "📋 自選股篩選",
+        "scr_watchlist": "股票代號 (以逗號、空格或換行分隔)",
+        "scr_ai": "為未緩存的股票執行 AI 定性評分 (較慢)",
+        "scr_run": "開始篩選",
+        "scr_progress": "已評分",
+        "scr_too_many": "只會篩選前 {n} 隻股票。",
+        "scr_empty": "沒有股票能完成評分。",
+        "scr_note": "最終評分需要全部 5 個 AI 主題評分；未啟用 AI 評分時，只有曾經分析過的股票才會有最終評分。",
+        "col_ticker": "代號", "col_name": "名稱", "col_pe": "市盈率", "col_pe_low": "最低 PE", "col_pe_high": "最高 PE",
+        "col_pe_pos": "PE 位置 %", "col_action": "技術面結論", "col_qual": "定性 (0-20)", "col_grade": "評級",
+        "bt_header": "🧪 技術規則回測",
+        "bt_tickers": "股票代號 (留空：所有已儲存歷史的股票)",
+        "bt_run": "開始回測",
+        "bt_empty": "沒有足夠的歷史數據。請先分析或篩選一些股票。",
+        "bt_note": "每隻股票的每個已儲存交易日都會得出技術面結論。回報為其後 N 個交易日的回報。命中率為股價按結論方向變動的日子比例（買入/持有/觀察為上升，觀望/賣出/獲利為下跌）。「全部」一行的命中率為上升日子的比例。",
+        "bt_done": "{tickers} 隻股票，{days:,} 個股票交易日",
+        "col_days": "日數", "col_share": "比例 %", "col_ret": "{h}日平均回報 %", "col_hit": "{h}日命中率 %", "bt_all": "全部日子"
     }
 }
 
@@ -282,24 +374,31 @@ st.markdown("""
 
 # --- API KEY SETUP ---
 try:
-    GROQ_API_KEY = st.secrets["GROQ_API_KEY"]
+    SERVER_GROQ_KEY = st.secrets["GROQ_API_KEY"]
 except (FileNotFoundError, KeyError):
+    SERVER_GROQ_KEY = None
+
+# The in-server warmer lives as long as the process, so it only runs on a server-side key
+# (st.secrets or the GROQ_API_KEY env var), never on a key a visitor typed into the sidebar.
+WARM_KEY = SERVER_GROQ_KEY or os.environ.get("GROQ_API_KEY")
+if WARM_IN_SERVER and WARM_KEY: start_background(WARM_KEY)
+
+GROQ_API_KEY = SERVER_GROQ_KEY
+if not GROQ_API_KEY:
     GROQ_API_KEY = st.sidebar.text_input("Enter Groq API Key", type="password")
     if not GROQ_API_KEY:
         st.warning("⚠️ Please enter a Groq API Key in the sidebar or set it in st.secrets.")
         st.stop()
 
-client = Groq(api_key=GROQ_API_KEY)
+client = get_client(GROQ_API_KEY)
 
 # --- DATA HELPERS ---
-def fmt_num(val, is_pct=False, is_currency=False):
-    if val is None or val == "N/A": return "-"
-    if is_pct: return f"{val * 100:.2f}%"
-    if is_currency:
-        if val > 1e12: return f"{val/1e12:.2f}T"
-        if val > 1e9: return f"{val/1e9:.2f}B"
-        if val > 1e6: return f"{val/1e6:.2f}M"
-    return f"{val:.2f}"
+# Grade key -> (background, border) colors for the final score box.
+GRADE_COLORS = {
+    "grade_strong_buy": ("#e6ffe6", "#006600"), "grade_buy": ("#f0fff0", "#009900"),
+    "grade_hold": ("#fffff0", "#b3b300"), "grade_sell": ("#fff5e6", "#cc6600"),
+    "grade_avoid": ("#ffcccc", "#cc0000"),
+}
 
 def fmt_dividend(val):
     if val is None: return "-"
@@ -310,128 +409,159 @@ def fmt_date(ts):
     try: return datetime.fromtimestamp(ts).strftime('%Y-%m-%d')
     except: return str(ts)
 
-def get_stock_data(ticker):
-    try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        if not info: return None
-        
-        price = info.get('currentPrice', 0)
-        hist = stock.history(period="5y")
-        if price == 0 and not hist.empty: price = hist['Close'].iloc[-1]
-        
-        eps = info.get('forwardEps')
-        if eps is None: eps = info.get('trailingEps')
-        
-        pe = info.get('forwardPE')
-        if pe is None: pe = price / eps if (eps and eps > 0) else 0
-
-        min_pe, max_pe = 0, 0
-        if eps and eps > 0 and not hist.empty:
-            pe_series = hist['Close'] / eps
-            pe_series = pe_series[(pe_series > 0) & (pe_series < 200)]
-            if not pe_series.empty:
-                min_pe = pe_series.min()
-                max_pe = pe_series.max()
-        
-        divs = stock.dividends
-        
-        try: earnings_dates = stock.earnings_dates
-        except: earnings_dates = None
-        
-        try: quarterly_financials = stock.quarterly_income_stmt
-        except: quarterly_financials = None
-            
-        try: raw_news = stock.news; news = [n for n in raw_news if n.get('title')]
-        except: news = []
-
-        return {
-            "price": price, "currency": info.get('currency', 'USD'), "pe": pe,
-            "eps": eps, "min_pe": min_pe, "max_pe": max_pe,
-            "name": info.get('longName', ticker), "industry": info.get('industry', 'Unknown'),
-            "summary": info.get('longBusinessSummary', 'No summary available.'), 
-            "history": hist, "dividends": divs, "raw_info": info,
-            "earnings_dates": earnings_dates, "quarterly_financials": quarterly_financials, "news": news
-        }
-    except: return None
-
-def calculate_technicals(df):
-    if df.empty or len(df) < 200: return None
-    df_recent = df.tail(300).copy()
-    df_recent['SMA_50'] = df_recent['Close'].rolling(window=50).mean()
-    df_recent['SMA_200'] = df_recent['Close'].rolling(window=200).mean()
-    
-    delta = df_recent['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df_recent['RSI'] = 100 - (100 / (1 + rs))
-    
-    avg_vol = df_recent['Volume'].rolling(window=20).mean().iloc[-1]
-    curr_vol = df_recent['Volume'].iloc[-1]
-    vol_ratio = curr_vol / avg_vol if avg_vol > 0 else 1.0
-    
-    recent_60 = df_recent.tail(60)
-    support = recent_60['Low'].min()
-    resistance = recent_60['High'].max()
-    
-    vol_short = df_recent['Close'].rolling(window=10).std().iloc[-1]
-    vol_long = df_recent['Close'].rolling(window=60).std().iloc[-1]
-    is_squeezing = vol_short < (vol_long * 0.5)
-    
-    curr_price = df_recent['Close'].iloc[-1]
-    sma_50 = df_recent['SMA_50'].iloc[-1]
-    sma_200 = df_recent['SMA_200'].iloc[-1]
+def earnings_summary(client, name, news_future, lang, on_text=None):
+    # Runs on the LLM pool: waits for the background news load, then asks for the summary.
+    return analyze_qualitative(client, name, earnings_context(news_future.result())['prompt_context'], "EarningsSummary", lang, on_text=on_text)
+
+def stream_to(q, kind):
+    # Worker threads cannot touch Streamlit elements, so streamed text goes through a queue that the
+    # script thread drains while it waits on the futures.
+    return lambda text: q.put((kind, text))
+
+# Max Groq requests in flight for one analysis (5 topics + valuation + earnings).
+LLM_MAX_WORKERS = 7
+# How often the script thread repaints streamed summaries while waiting on results.
+STREAM_POLL_SECONDS = 0.05
+
+# --- RENDER HELPERS ---
+def render_topic(slot, label, s, r, note=None):
+    # `note` marks a fallback score shown until the AI answer arrives. It shares the reason's caption so
+    # the answer's redraw overwrites every element of the fallback.
+    with slot.container(border=True):
+        c1, c2 = st.columns([4, 1])
+        with c1: st.markdown(f"**{label}**")
+        with c2: st.markdown(f"<h4 style='margin:0; text-align:right; color:{'#888' if note else '#4da6ff'};'>{s} <span style='font-size:14px; color:#888;'>/ 4</span></h4>", unsafe_allow_html=True)
+        st.progress(min(s/4.0, 1.0))
+        st.caption(f"{r}  \n⚡ {note}" if note else r)
+
+# Info field behind each fallback topic score -> its label.
+FALLBACK_LABELS = {"grossMargins": "fin_gross_marg", "profitMargins": "fin_prof_marg", "returnOnEquity": "fin_roe", "returnOnAssets": "fin_roa", "revenueGrowth": "rev_growth"}
+
+def fallback_topic(client, data, topic, topics, lang):
+    # (score, reason, note) for a topic whose AI answer missed the deadline: a cached answer from either
+    # scoring mode if there is one, otherwise the local heuristic over raw_info.
+    cached = cached_topic_score(client, data['name'], data['summary'], topic, topics, lang)
+    if cached: return cached[0], cached[1], txt('fallback_cached')
+    s, field, value = heuristic_topic_score(topic, data['raw_info'])
+    metric = txt(FALLBACK_LABELS[field])
+    reason = txt('fallback_reason_missing').format(metric=metric) if value is None else txt('fallback_reason').format(metric=metric, value=fmt_num(value, is_pct=True))
+    return s, reason, txt('fallback_estimate')
+
+def render_val_summary(text, streaming=False):
+    st.caption(f"🤖 **{txt('val_ai_analysis')}**")
+    st.info(text + (" ▌" if streaming else ""))
+
+def render_final_score(total_qual, mult, provisional=False):
+    final_score = round(total_qual * mult, 1)
+    g_key = grade_key(final_score)
+    verdict_text = txt(g_key)
+    v_color, v_border = GRADE_COLORS[g_key]
+    st.markdown(f"""
+    <div class="final-score-box" style="border-color: {v_border}; padding: 20px;">
+    <h3 style="color:#555; margin:0;">{txt('score_calc_title')}</h3>
+    <div style="display:flex; justify-content:center; align-items:center; gap:10px; flex-wrap:wrap; margin-top:10px;">
+        <div><div style="font-size:30px; font-weight:bold;">{total_qual:g}</div><div style="font-size:12px;">{txt('calc_qual')}</div></div>
+        <div style="font-size:20px;">✖</div>
+        <div><div style="font-size:30px; font-weight:bold;">{mult:g}</div><div style="font-size:12px;">{txt('calc_mult')}</div></div>
+        <div style="font-size:20px;">=</div>
+        <div style="background:{v_color}; padding:10px 20px; border-radius:10px; border:2px solid {v_border};">
+            <div style="font-size:40px; font-weight:900; color:{v_border}; line-height:1;">{final_score}</div>
+            <div style="font-size:14px; font-weight:bold; color:#333;">{verdict_text}</div>
+        </div>
+    </div></div>
+    """, unsafe_allow_html=True)
+    # Always emitted, so the final redraw blanks the provisional note.
+    st.caption(f"⚡ {txt('score_provisional')}" if provisional else "")
+
+def render_score_history(ticker):
+    hist = score_history.series(ticker)
+    if len(hist) < 2: return
+    with st.expander(txt('score_history'), expanded=False):
+        st.line_chart(hist[['final_score', 'total_qual']].rename(columns={'final_score': txt('final_score_lbl'), 'total_qual': txt('calc_qual')}))
+        st.caption(txt('score_history_note'))
+
+def render_financials(i, fin_data):
+    def row(cols):
+        c = st.columns(len(cols))
+        for idx, (k, v) in enumerate(cols): c[idx].metric(txt(k), v)
+
+    row([("fin_mkt_cap", fmt_num(i.get('marketCap'), is_currency=True)), ("fin_ent_val", fmt_num(i.get('enterpriseValue'), is_currency=True)), ("fin_trail_pe", fmt_num(i.get('trailingPE'))), ("fin_fwd_pe", fmt_num(i.get('forwardPE')))])
+    st.divider()
+    row([("fin_peg", fmt_num(i.get('pegRatio'))), ("fin_ps", fmt_num(i.get('priceToSalesTrailing12Months'))), ("fin_pb", fmt_num(i.get('priceToBook'))), ("fin_beta", fmt_num(i.get('beta')))])
+    st.divider()
+    row([("fin_prof_marg", fmt_num(i.get('profitMargins'), is_pct=True)), ("fin_gross_marg", fmt_num(i.get('grossMargins'), is_pct=True)), ("fin_roa", fmt_num(i.get('returnOnAssets'), is_pct=True)), ("fin_roe", fmt_num(i.get('returnOnEquity'), is_pct=True))])
+    st.divider()
+    row([("fin_eps", fmt_num(i.get('trailingEps'))), ("fin_rev", fmt_num(i.get('totalRevenue'), is_currency=True)), ("fin_div_yield", fmt_dividend(i.get('dividendYield'))), ("fin_target", fmt_num(i.get('targetMeanPrice')))])
+    st.divider()
     
-    trend = "neutral"
-    if curr_price > sma_200:
-        trend = "uptrend" if curr_price > sma_50 else "weak_uptrend"
-    else:
-        trend = "downtrend"
-        
-    return {
-        "trend": trend, "rsi": df_recent['RSI'].iloc[-1], 
-        "support": support, "resistance": resistance,
-        "vol_ratio": vol_ratio, "is_squeezing": is_squeezing,
-        "last_price": curr_price, "data": df_recent 
-    }
+    st.subheader(txt('recent_div'))
+    divs = fin_data.get('dividends')
+    if divs is not None and not divs.empty:
+        df_divs = divs.sort_index(ascending=False).head(10).reset_index()
+        df_divs.columns = ["Date", "Amount"]
+        df_divs['Date'] = df_divs['Date'].dt.strftime('%Y-%m-%d')
+        st.table(df_divs)
+    else: st.info(txt('no_div'))
+    st.caption(f"{txt('fiscal_year')}: {fmt_date(i.get('lastFiscalYearEnd'))}")
+
+def render_news(news_data):
+    ctx = earnings_context(news_data)
+    latest_earnings, earn_date, act_eps, q_stmt = ctx['latest_earnings'], ctx['earn_date'], ctx['act_eps'], news_data['quarterly_financials']
+
+    st.subheader(txt('earn_title'))
+    if latest_earnings is not None:
+        with st.container(border=True):
+            ec1, ec2, ec3, ec4 = st.columns(4)
+            ec1.metric(txt('earn_date'), earn_date)
+            est_eps = latest_earnings.get('EPS Estimate'); ec2.metric(txt('earn_est_eps'), f"{est_eps:.2f}" if pd.notna(est_eps) else "-")
+            ec3.metric(txt('earn_act_eps'), f"{act_eps:.2f}" if pd.notna(act_eps) else "-")
+            
+            surprise = latest_earnings.get('Surprise(%)')
+            ec4.metric(txt('earn_surprise'), 
+                       f"{surprise:.2f}%" if pd.notna(surprise) else "-", 
+                       delta="Positive" if pd.notna(surprise) and surprise > 0 else "Negative" if pd.notna(surprise) and surprise < 0 else None)
+    else: 
+        st.info("No specific earnings calendar data found.")
 
-def analyze_qualitative(ticker, summary, topic):
-    PRIMARY_MODEL = "llama-3.3-70b-versatile" 
-    BACKUP_MODEL  = "llama-3.1-8b-instant"    
-    
-    lang_instruction = "Answer in English."
-    if st.session_state.language == 'CN':
-        lang_instruction = "You MUST Output the reason in Traditional Chinese (繁體中文)."
-
-    if topic == "EarningsSummary":
-        prompt = f"Summarize the recent financial performance and news for {ticker}. Context: {summary}. Keep it concise (3-4 bullet points). {lang_instruction}"
-    elif topic == "ValuationSummary":
-        # NEW PROMPT FOR VALUATION
-        prompt = f"Analyze the valuation status of {ticker} based on this data: {summary}. Is it undervalued or overvalued relative to its history? Provide a 1-sentence insight. {lang_instruction}"
-    else:
-        prompt = (
-            f"Analyze {ticker} regarding '{topic}'. Context: {summary}. "
-            f"Give a specific score from 0.0 to 4.0 (use 1 decimal place). "
-            f"Provide a 1 sentence reason. {lang_instruction} "
-            f"Strict Format: SCORE|REASON"
-        )
+    st.markdown("---")
     
-    def call_groq(model_id):
-        return client.chat.completions.create(
-            model=model_id, messages=[{"role": "user", "content": prompt}],
-            temperature=0.1, max_tokens=400 
-        )
-
-    try:
-        resp = call_groq(PRIMARY_MODEL)
-        return resp.choices[0].message.content, False
-    except:
-        try:
-            resp = call_groq(BACKUP_MODEL)
-            return resp.choices[0].message.content, True
-        except Exception as e:
-            return f"0.0|Error: {str(e)}", True
+    st.subheader(txt('qq_title'))
+    if q_stmt is not None and not q_stmt.empty and q_stmt.shape[1] >= 2:
+        curr = q_stmt.iloc[:, 0]; prev = q_stmt.iloc[:, 1]
+        def calc_pct(cur, pre):
+            try: return ((cur - pre) / abs(pre)) * 100 if pre != 0 else None
+            except: return None
+        def show_qq(label, cur_val, prev_val, is_curr=True, is_pct=False):
+            pct = calc_pct(cur_val, prev_val)
+            display_val = fmt_num(cur_val, is_currency=is_curr, is_pct=is_pct)
+            if is_pct: display_val = f"{cur_val*100:.2f}%" if pd.notna(cur_val) else "-"
+            st.metric(label, display_val, f"{pct:.2f}%" if pct is not None else "-", delta_color="normal")
+
+        c_q1, c_q2, c_q3 = st.columns(3)
+        with c_q1:
+            show_qq(txt('qq_rev'), curr.get('Total Revenue'), prev.get('Total Revenue'))
+            show_qq(txt('qq_op_inc'), curr.get('Operating Income'), prev.get('Operating Income'))
+        with c_q2:
+            show_qq(txt('qq_net_inc'), curr.get('Net Income'), prev.get('Net Income'))
+            show_qq(txt('qq_op_exp'), curr.get('Operating Expense'), prev.get('Operating Expense'))
+        with c_q3:
+            show_qq(txt('qq_eps'), curr.get('Basic EPS'), prev.get('Basic EPS'), is_curr=False)
+            try:
+                gm_c = curr.get('Gross Profit') / curr.get('Total Revenue')
+                gm_p = prev.get('Gross Profit') / prev.get('Total Revenue')
+                diff_bps = (gm_c - gm_p) * 100
+                st.metric(txt('qq_gross_marg'), f"{gm_c*100:.2f}%", f"{diff_bps:.2f} bps")
+            except: st.metric(txt('qq_gross_marg'), "-")
+    else: 
+        st.info("Insufficient quarterly data for Q/Q comparison.")
+
+def render_perf_panel():
+    # p50/p95 per stage across every session on this server (see perf.py); filled in at the end of the run.
+    if not show_perf: return
+    rows = recorder.summary()
+    with perf_slot.container():
+        if rows: st.dataframe(pd.DataFrame(rows).round(1), hide_index=True, use_container_width=True)
+        else: st.caption(txt('perf_empty'))
 
 # --- TOP BAR ---
 col_title, col_lang = st.columns([8, 1])
@@ -445,9 +575,13 @@ with col_lang:
 if 'layout_mode' not in st.session_state: st.session_state.layout_mode = 'desktop' 
 if 'active_ticker' not in st.session_state: st.session_state.active_ticker = "NVDA"
 if 'active_market' not in st.session_state: st.session_state.active_market = "US"
+if 'results' not in st.session_state: st.session_state.results = SessionResults()
+if 'shown_ticker' not in st.session_state: st.session_state.shown_ticker = None
 
 with st.sidebar:
     st.header(txt('sidebar_title'))
+    mode_labels = {txt(f"mode_{m}"): m for m in ("single", "screener", "backtest")}
+    app_mode = mode_labels[st.radio(txt('mode_label'), list(mode_labels), horizontal=True)]
     with st.form(key='desktop_form'):
         st.caption(txt('market_label'))
         d_market = st.selectbox("M", ["US", "Canada (TSX)", "HK (HKEX)"], label_visibility="collapsed")
@@ -457,6 +591,21 @@ with st.sidebar:
     
     st.markdown("---")
     st.caption("**Primary:** Llama 3.3 70B\n**Backup:** Llama 3.1 8B")
+    cooldown = breaker(PRIMARY_MODEL).remaining()
+    if cooldown: st.caption(f"⚠️ {txt('breaker_open').format(secs=int(cooldown))}")
+    scoring_labels = {txt(f"scoring_{m}"): m for m in SCORING_MODES}
+    scoring_mode = scoring_labels[st.radio(txt('scoring_mode'), list(scoring_labels))]
+    mc = market_cache.stats()
+    st.caption(f"**Data cache:** {mc['hits']} hits / {mc['misses']} misses · {mc['entries']} entries ({mc['bytes']/1e6:.1f} MB)")
+    ss = snapshots.stats()
+    st.caption(f"**Shared snapshots:** {ss['entries']} tickers ({ss['bytes']/1e6:.2f} MB)")
+    lc = llm_cache.stats()
+    st.caption(f"**AI cache:** {lc['hits']} hits / {lc['misses']} misses · {lc['entries']} entries")
+    fs = flight_stats()
+    deduped = {name: g['deduped'] for name, g in fs.items() if g['deduped']}
+    if deduped: st.caption("**Coalesced:** " + " · ".join(f"{name} {n}" for name, n in deduped.items()))
+    show_perf = st.toggle(txt('perf_toggle'), value=False)
+    perf_slot = st.empty()
 
     st.markdown(f"""
     <div class="methodology-box">
@@ -492,89 +641,173 @@ elif m_submit:
     st.session_state.layout_mode, st.session_state.active_ticker, st.session_state.active_market = 'mobile', m_ticker, m_market
     run_analysis = True
 
+# --- SCREENER MODE ---
+if app_mode == "screener":
+    st.header(txt('scr_header'))
+    with st.form(key='screener_form'):
+        s_market = st.selectbox(txt('market_label'), ["US", "Canada (TSX)", "HK (HKEX)"], key='s_m')
+        s_text = st.text_area(txt('scr_watchlist'), value="NVDA, AAPL, MSFT, GOOGL, AMZN, META", height=150)
+        s_ai = st.checkbox(txt('scr_ai'), value=False)
+        s_submit = st.form_submit_button(txt('scr_run'), type="primary")
+    st.caption(txt('scr_note'))
+
+    if s_submit:
+        symbols = parse_watchlist(s_text, s_market)
+        if len(symbols) > SCREENER_MAX_TICKERS: st.warning(txt('scr_too_many').format(n=SCREENER_MAX_TICKERS))
+        scr_bar = st.progress(0.0)
+        def on_progress(done, total):
+            scr_bar.progress(done / total if total else 1.0, text=f"{txt('scr_progress')} {done}/{total}")
+        res_df = run_screener(client, symbols, st.session_state.language, s_ai, on_progress, scoring_mode)
+        scr_bar.empty()
+
+        if res_df.empty: st.warning(txt('scr_empty'))
+        else:
+            res_df['trend'] = res_df['trend'].map(lambda k: txt(k) if k else None)
+            res_df['action'] = res_df['action'].map(lambda k: txt(k) if k else None)
+            res_df['grade'] = res_df['grade'].map(lambda k: txt(k) if k else None)
+            st.dataframe(
+                res_df, use_container_width=True, hide_index=True,
+                column_config={
+                    "ticker": txt('col_ticker'), "name": txt('col_name'),
+                    "price": st.column_config.NumberColumn(txt('price'), format="%.2f"),
+                    "pe": st.column_config.NumberColumn(txt('col_pe'), format="%.2f"),
+                    "min_pe": st.column_config.NumberColumn(txt('col_pe_low'), format="%.1f"),
+                    "max_pe": st.column_config.NumberColumn(txt('col_pe_high'), format="%.1f"),
+                    "pe_pos": st.column_config.NumberColumn(txt('col_pe_pos'), format="%.1f"),
+                    "mult": st.column_config.NumberColumn(txt('calc_mult'), format="x%.0f"),
+                    "trend": txt('trend'), "rsi": st.column_config.NumberColumn(txt('lbl_rsi'), format="%.1f"),
+                    "action": txt('col_action'), "qual": st.column_config.NumberColumn(txt('col_qual'), format="%.1f"),
+                    "final_score": st.column_config.NumberColumn(txt('calc_result'), format="%.1f"),
+                    "grade": txt('col_grade'),
+                },
+            )
+    render_perf_panel()
+    st.stop()
+
+# --- BACKTEST MODE ---
+if app_mode == "backtest":
+    st.header(txt('bt_header'))
+    with st.form(key='backtest_form'):
+        b_market = st.selectbox(txt('market_label'), ["US", "Canada (TSX)", "HK (HKEX)"], key='b_m')
+        b_text = st.text_area(txt('bt_tickers'), value="", height=100)
+        b_submit = st.form_submit_button(txt('bt_run'), type="primary")
+    st.caption(txt('bt_note'))
+
+    if b_submit:
+        with span("backtest.run"): bt_df = backtest(parse_watchlist(b_text, b_market))
+        if bt_df.empty: st.warning(txt('bt_empty'))
+        else:
+            st.caption(txt('bt_done').format(tickers=bt_df.attrs['tickers'], days=int(bt_df.loc['all', 'days'])))
+            bt_df.index = [txt('bt_all') if a == "all" else txt(a) for a in bt_df.index]
+            col_cfg = {"days": txt('col_days'), "share_pct": st.column_config.NumberColumn(txt('col_share'), format="%.1f")}
+            for h in HORIZONS:
+                col_cfg[f"ret_{h}d_pct"] = st.column_config.NumberColumn(txt('col_ret').format(h=h), format="%.2f")
+                col_cfg[f"hit_{h}d_pct"] = st.column_config.NumberColumn(txt('col_hit').format(h=h), format="%.1f")
+            st.dataframe(bt_df, use_container_width=True, column_config=col_cfg)
+    render_perf_panel()
+    st.stop()
+
 # --- MAIN EXECUTION ---
+# Submitting a form runs a fresh analysis; any other rerun (language toggle, sidebar widgets) redraws
+# the last ticker from the session store, and only requests the LLM text missing for this language.
+results = st.session_state.results
 if run_analysis:
-    raw_t = st.session_state.active_ticker
-    mkt = st.session_state.active_market
-    final_t = raw_t
-    if mkt == "Canada (TSX)" and ".TO" not in raw_t: final_t += ".TO"
-    elif mkt == "HK (HKEX)": 
-        nums = ''.join(filter(str.isdigit, raw_t))
-        final_t = f"{nums.zfill(4)}.HK" if nums else f"{raw_t}.HK"
-
-    with st.spinner(f"{txt('loading_data')} {final_t}..."):
-        data = get_stock_data(final_t)
+    final_t = normalize_ticker(st.session_state.active_ticker, st.session_state.active_market)
+    results.discard(final_t)
+    st.session_state.shown_ticker = final_t
+else:
+    final_t = st.session_state.shown_ticker
+
+if final_t:
+    lang = st.session_state.language
+    stored = results.numeric(final_t)
+    stored_text = results.text(final_t, lang)
+
+    run_t0 = time.perf_counter()
+    if stored: data = stored['data']
+    else:
+        with st.spinner(f"{txt('loading_data')} {final_t}..."):
+            with span("analysis.load_core", ticker=final_t): data = load_core(final_t)
 
     if data:
         st.header(f"{data['name']} ({final_t})")
         st.caption(f"{txt('industry')}: {data['industry']} | {txt('currency')}: {data['currency']}")
-        
+
+        # Financials and News & Earnings data load in the background while the Value tab renders.
+        if stored:
+            fin_future, news_future = resolved(stored['fin']), resolved(stored['news'])
+        else:
+            data_pool = ThreadPoolExecutor(max_workers=2)
+            fin_future = data_pool.submit(load_financials, final_t)
+            news_future = data_pool.submit(load_news, final_t)
+            data_pool.shutdown(wait=False)
+
+        # Components whose inputs are unchanged since this ticker's last stored analysis are taken from
+        # the score history instead of recomputed, as in pipeline.py (see score_history.py).
+        eng_topics = QUAL_TOPICS
+        fps = input_fingerprints(data, eng_topics, lang, scoring_mode)
+        prev = score_history.latest(final_t, lang)
+        reuse = score_history.reusable(prev, fps)
+
+        # --- VALUATION CONTEXT (built up front so every LLM prompt can be sent at once) ---
+        pe = data['pe']
+        min_pe, max_pe = data['min_pe'], data['max_pe']
+        if "valuation" in reuse: mult, pos_pct = prev['mult'], prev['pe_pos']
+        else: mult, pos_pct = valuation_multiplier(pe, min_pe, max_pe)
+        color_code = "#FF4500"
+        if mult >= 4: color_code = "#00C805"
+        elif mult >= 3: color_code = "#90EE90"
+        elif mult >= 2: color_code = "#FFA500"
+
+        val_context = valuation_context(data)
+
+        # --- CONCURRENT LLM CALLS: all seven prompts are independent, so send them together ---
+        stream_q = queue.Queue()
+        if stored_text:
+            topic_futures = {resolved(stored_text['topics']): None}
+            val_future, earn_future = resolved(stored_text['val']), resolved(stored_text['earn'])
+        else:
+            # The tally totals the tokens of the Groq requests this analysis itself sends.
+            llm_tally = Tally()
+            llm_pool = ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS, initializer=llm_tally.bind)
+            # Reused topic scores resolve at once. Otherwise batched mode uses one future for every topic
+            # (index None), and per-topic mode one future per topic.
+            if "topics" in reuse:
+                topic_futures = {resolved([(s, r, False) for s, r in prev['topics']]): None}
+            elif scoring_mode == "batched":
+                topic_futures = {llm_pool.submit(score_topics_batched, client, data['name'], data['summary'], eng_topics, lang): None}
+            else:
+                topic_futures = {llm_pool.submit(score_topic, client, data['name'], data['summary'], t_eng, lang): i for i, t_eng in enumerate(eng_topics)}
+            val_future = llm_pool.submit(analyze_qualitative, client, data['name'], val_context, "ValuationSummary", lang, on_text=stream_to(stream_q, "valuation"))
+            earn_future = llm_pool.submit(earnings_summary, client, data['name'], news_future, lang, on_text=stream_to(stream_q, "earnings_ai"))
+            llm_pool.shutdown(wait=False)
+
         tab_fund, tab_tech, tab_fin, tab_news = st.tabs([txt('tab_value'), txt('tab_tech'), txt('tab_fin'), txt('tab_news')])
 
-        # --- TAB 1: FUNDAMENTAL ---
+        # --- TAB 1: FUNDAMENTAL (layout now, AI results fill in below) ---
         with tab_fund:
-            eng_topics = ["Unique Product/Moat", "Revenue Growth", "Competitive Advantage", "Profit Stability", "Management"]
             display_topics = txt('topics')
-            qual_results = []
-            total_qual = 0.0 
-            backup_used = False
+            topic_scores = [0.0] * len(eng_topics)
             
             prog_bar = st.progress(0)
             col_q, col_v = st.columns([1.6, 1])
             
             with col_q:
                 st.subheader(txt('val_analysis_header'))
-                for i, t_eng in enumerate(eng_topics):
-                    prog_bar.progress((i)/5)
-                    res, is_backup = analyze_qualitative(data['name'], data['summary'], t_eng)
-                    if is_backup: backup_used = True
-                    match = re.search(r'\b([0-3](?:\.\d)?|4(?:\.0)?)\b', res)
-                    if match:
-                        s_str = match.group(1); s = float(s_str)
-                        r = res.replace(s_str, "").replace("|", "").replace("SCORE", "").replace("REASON", "").strip().strip(' :-=\n')
-                    else: s, r = 0.0, res 
-                    total_qual += s
-                    with st.container(border=True):
-                        c1, c2 = st.columns([4, 1])
-                        with c1: st.markdown(f"**{display_topics[i]}**")
-                        with c2: st.markdown(f"<h4 style='margin:0; text-align:right; color:#4da6ff;'>{s} <span style='font-size:14px; color:#888;'>/ 4</span></h4>", unsafe_allow_html=True)
-                        st.progress(min(s/4.0, 1.0))
-                        st.caption(r)
-                prog_bar.empty()
-                if backup_used: st.toast("Backup Model used.", icon="⚠️")
-
-            pe = data['pe']
-            min_pe, max_pe = data['min_pe'], data['max_pe']
-            mult = 1.0
-            pos_pct = 1.0
-            color_code = "#FF4500"
-
-            if pe and pe > 0 and max_pe > min_pe:
-                pos_pct = (pe - min_pe) / (max_pe - min_pe)
-                if pos_pct < 0.25: mult = 5.0
-                elif pos_pct < 0.50: mult = 4.0
-                elif pos_pct < 0.75: mult = 3.0
-                elif pos_pct < 1.00: mult = 2.0
-                else: mult = 1.0
-            if mult >= 4: color_code = "#00C805"
-            elif mult >= 3: color_code = "#90EE90"
-            elif mult >= 2: color_code = "#FFA500"
-
-            final_score = round(total_qual * mult, 1)
-            
-            verdict_text, v_color, v_border = txt('grade_avoid'), "#ffcccc", "#cc0000"
-            if final_score >= 75: verdict_text, v_color, v_border = txt('grade_strong_buy'), "#e6ffe6", "#006600"
-            elif final_score >= 60: verdict_text, v_color, v_border = txt('grade_buy'), "#f0fff0", "#009900"
-            elif final_score >= 45: verdict_text, v_color, v_border = txt('grade_hold'), "#fffff0", "#b3b300"
-            elif final_score >= 30: verdict_text, v_color, v_border = txt('grade_sell'), "#fff5e6", "#cc6600"
+                # Reserve a slot per topic so answers keep their order while filling in as they arrive
+                topic_slots = [st.empty() for _ in eng_topics]
 
             with col_v:
                 st.subheader(txt('quant_val_header'))
                 with st.container(border=True):
                     st.metric(txt('price'), f"{data['price']:.2f}")
-                    st.metric(txt('pe_ttm'), fmt_num(data['raw_info'].get('trailingPE')))
-                    st.metric(txt('pe_ratio'), f"{pe:.2f}" if pe and pe > 0 else "N/A")
-                    st.caption(f"PE Range (5Y): {min_pe:.1f} - {max_pe:.1f}")
+                    # The PE placed in the range is trailing on a TTM range and forward otherwise; the other is shown as reported.
+                    placed = f"{pe:.2f}" if pe and pe > 0 else "N/A"
+                    ttm_basis = data['pe_basis'] == "ttm"
+                    st.metric(txt('pe_ttm'), placed if ttm_basis else fmt_num(data['raw_info'].get('trailingPE')))
+                    st.metric(txt('pe_ratio'), fmt_num(data['raw_info'].get('forwardPE')) if ttm_basis else placed)
+                    pct_text = f" · {txt('pe_pctile')}: {data['pe_pct']*100:.0f}%" if data.get('pe_pct') is not None else ""
+                    st.caption(f"PE Range ({data['pe_years'] or 0:.1f}Y): {min_pe:.1f} - {max_pe:.1f}{pct_text}", help=txt(f"pe_basis_{data['pe_basis']}"))
                     st.progress(max(0.0, min(1.0, pos_pct)) if pe > 0 else 1.0)
                     
                     cc1, cc2 = st.columns([1,1])
@@ -584,12 +817,8 @@ if run_analysis:
                     st.divider()
                     
                     # --- NEW: AI VALUATION SUMMARY ---
-                    val_context = f"Forward PE: {pe:.2f}. 5-Year Lowest PE: {min_pe:.2f}. 5-Year Highest PE: {max_pe:.2f}. Current Position: {pos_pct*100:.1f}% (0% is Low/Cheap, 100% is High/Expensive)."
-                    
-                    with st.spinner("AI Valuation Analysis..."):
-                         val_ai_text, _ = analyze_qualitative(data['name'], val_context, "ValuationSummary")
-                         st.caption(f"🤖 **{txt('val_ai_analysis')}**")
-                         st.info(val_ai_text)
+                    val_slot = st.empty()
+                    val_slot.caption(f"⏳ {txt('loading_ai')} {txt('val_ai_analysis')}")
 
                     st.subheader(txt('multiplier_label'))
                     st.markdown(f"""<div class="multiplier-box" style="border: 2px solid {color_code}; color: {color_code};">x{mult:.0f}</div>""", unsafe_allow_html=True)
@@ -597,7 +826,7 @@ if run_analysis:
                     with st.expander(txt('mult_how')):
                         st.markdown(f"""
                         **{txt('mult_exp_title')}**  
-                        {txt('mult_exp_desc')}
+                        {txt('mult_exp_desc').format(years=data['pe_years'] or 0)}
                         **{txt('mult_formula')}**  
                         `({pe:.2f} - {min_pe:.2f}) / ({max_pe:.2f} - {min_pe:.2f}) = {pos_pct*100:.1f}%`
                         | {txt('mult_table_pos')} | {txt('mult_table_mult')} | {txt('mult_table_mean')} |
@@ -609,20 +838,8 @@ if run_analysis:
                         | > 100% | **x1** | {txt('status_over')} |
                         """)
 
-            st.markdown(f"""
-            <div class="final-score-box" style="border-color: {v_border}; padding: 20px;">
-            <h3 style="color:#555; margin:0;">{txt('score_calc_title')}</h3>
-            <div style="display:flex; justify-content:center; align-items:center; gap:10px; flex-wrap:wrap; margin-top:10px;">
-                <div><div style="font-size:30px; font-weight:bold;">{total_qual:g}</div><div style="font-size:12px;">{txt('calc_qual')}</div></div>
-                <div style="font-size:20px;">✖</div>
-                <div><div style="font-size:30px; font-weight:bold;">{mult:g}</div><div style="font-size:12px;">{txt('calc_mult')}</div></div>
-                <div style="font-size:20px;">=</div>
-                <div style="background:{v_color}; padding:10px 20px; border-radius:10px; border:2px solid {v_border};">
-                    <div style="font-size:40px; font-weight:900; color:{v_border}; line-height:1;">{final_score}</div>
-                    <div style="font-size:14px; font-weight:bold; color:#333;">{verdict_text}</div>
-                </div>
-            </div></div>
-            """, unsafe_allow_html=True)
+            score_slot = st.empty()
+            history_slot = st.empty()
 
             with st.expander(txt('grading_scale'), expanded=False):
                 st.markdown(f"""
@@ -635,20 +852,11 @@ if run_analysis:
                 </table>
                 """, unsafe_allow_html=True)
 
-        # --- TAB 2: TECHNICAL ---
+        # --- TAB 2: TECHNICAL (history is part of the core load, so it renders immediately) ---
         with tab_tech:
-            tech = calculate_technicals(data['history'])
+            tech = data.technicals()
             if tech:
-                action_key, reason_key = "act_avoid", "reas_down"
-                if "uptrend" in tech['trend']:
-                    if tech['last_price'] < tech['support'] * 1.05: action_key, reason_key = "act_buy_sup", "reas_sup"
-                    elif tech['vol_ratio'] > 1.5: action_key, reason_key = "act_buy_break", "reas_vol"
-                    elif tech['is_squeezing']: action_key, reason_key = "act_prep", "reas_vcp"
-                    elif tech['rsi'] > 70: action_key, reason_key = "act_profit", "reas_over"
-                    else: action_key, reason_key = "act_buy_hold", "reas_health"
-                else:
-                    if tech['last_price'] < tech['support']: action_key, reason_key = "act_sell_sup", "reas_break_sup"
-                    elif tech['rsi'] < 30: action_key, reason_key = "act_watch_oversold", "reas_oversold"
+                action_key, reason_key = technical_action(tech)
                 
                 st.subheader(f"{txt('tech_verdict')}: {txt(action_key)}")
                 st.info(f"📝 {txt('reason')}: {txt(reason_key)}")
@@ -663,109 +871,29 @@ if run_analysis:
                 c_sup.success(f"🛡️ {txt('support')}: {tech['support']:.2f}")
                 c_res.error(f"🚧 {txt('resistance')}: {tech['resistance']:.2f}")
 
-                st.line_chart(tech['data'][['Close', 'SMA_50', 'SMA_200']], color=["#0000FF", "#FFA500", "#FF0000"])
+                if st.toggle(txt('long_range'), key='long_range_chart'):
+                    chart, total_bars = long_range_frame(final_t, data['min_pe'], data['max_pe'], data['eps'], data['pe_basis'])
+                    chart = chart.rename(columns={"PE_low": f"PE {data['min_pe']:.1f}x", "PE_high": f"PE {data['max_pe']:.1f}x"})
+                    st.line_chart(chart, color=["#0000FF", "#FFA500", "#FF0000", "#2E8B57", "#9370DB"][:chart.shape[1]])
+                    st.caption(txt('long_range_note').format(shown=len(chart), total=total_bars, years=data['pe_years'] or 0))
+                else:
+                    st.line_chart(tech['data'][['Close', 'SMA_50', 'SMA_200']], color=["#0000FF", "#FFA500", "#FF0000"])
             else: st.warning("Not enough historical data.")
 
-        # --- TAB 3: FINANCIALS ---
+        # --- TAB 3: FINANCIALS (placeholder until the background load finishes) ---
         with tab_fin:
-            i = data['raw_info']
-            def row(cols):
-                c = st.columns(len(cols))
-                for idx, (k, v) in enumerate(cols): c[idx].metric(txt(k), v)
-
-            row([("fin_mkt_cap", fmt_num(i.get('marketCap'), is_currency=True)), ("fin_ent_val", fmt_num(i.get('enterpriseValue'), is_currency=True)), ("fin_trail_pe", fmt_num(i.get('trailingPE'))), ("fin_fwd_pe", fmt_num(i.get('forwardPE')))])
-            st.divider()
-            row([("fin_peg", fmt_num(i.get('pegRatio'))), ("fin_ps", fmt_num(i.get('priceToSalesTrailing12Months'))), ("fin_pb", fmt_num(i.get('priceToBook'))), ("fin_beta", fmt_num(i.get('beta')))])
-            st.divider()
-            row([("fin_prof_marg", fmt_num(i.get('profitMargins'), is_pct=True)), ("fin_gross_marg", fmt_num(i.get('grossMargins'), is_pct=True)), ("fin_roa", fmt_num(i.get('returnOnAssets'), is_pct=True)), ("fin_roe", fmt_num(i.get('returnOnEquity'), is_pct=True))])
-            st.divider()
-            row([("fin_eps", fmt_num(i.get('trailingEps'))), ("fin_rev", fmt_num(i.get('totalRevenue'), is_currency=True)), ("fin_div_yield", fmt_dividend(i.get('dividendYield'))), ("fin_target", fmt_num(i.get('targetMeanPrice')))])
-            st.divider()
-            
-            st.subheader(txt('recent_div'))
-            divs = data.get('dividends')
-            if divs is not None and not divs.empty:
-                df_divs = divs.sort_index(ascending=False).head(10).reset_index()
-                df_divs.columns = ["Date", "Amount"]
-                df_divs['Date'] = df_divs['Date'].dt.strftime('%Y-%m-%d')
-                st.table(df_divs)
-            else: st.info(txt('no_div'))
-            st.caption(f"{txt('fiscal_year')}: {fmt_date(i.get('lastFiscalYearEnd'))}")
+            fin_slot = st.empty()
+            fin_slot.caption(f"⏳ {txt('loading_tab')}")
 
         # --- TAB 4: NEWS & EARNINGS ---
         with tab_news:
-            st.subheader(txt('earn_title'))
-            latest_earnings = None; earn_date = "N/A"; act_eps = None
-            if data['earnings_dates'] is not None and not data['earnings_dates'].empty:
-                now = pd.Timestamp.now(tz=data['earnings_dates'].index.tz)
-                past_earnings = data['earnings_dates'][data['earnings_dates'].index < now]
-                if not past_earnings.empty:
-                    latest_earnings = past_earnings.iloc[0]; earn_date = past_earnings.index[0].strftime('%Y-%m-%d')
-            
-            if latest_earnings is not None:
-                with st.container(border=True):
-                    ec1, ec2, ec3, ec4 = st.columns(4)
-                    ec1.metric(txt('earn_date'), earn_date)
-                    est_eps = latest_earnings.get('EPS Estimate'); ec2.metric(txt('earn_est_eps'), f"{est_eps:.2f}" if pd.notna(est_eps) else "-")
-                    act_eps = latest_earnings.get('Reported EPS'); ec3.metric(txt('earn_act_eps'), f"{act_eps:.2f}" if pd.notna(act_eps) else "-")
-                    
-                    surprise = latest_earnings.get('Surprise(%)')
-                    ec4.metric(txt('earn_surprise'), 
-                               f"{surprise:.2f}%" if pd.notna(surprise) else "-", 
-                               delta="Positive" if pd.notna(surprise) and surprise > 0 else "Negative" if pd.notna(surprise) and surprise < 0 else None)
-            else: 
-                st.info("No specific earnings calendar data found.")
-
-            st.markdown("---")
-            
-            st.subheader(txt('qq_title'))
-            q_stmt = data['quarterly_financials']
-            if q_stmt is not None and not q_stmt.empty and q_stmt.shape[1] >= 2:
-                curr = q_stmt.iloc[:, 0]; prev = q_stmt.iloc[:, 1]
-                def calc_pct(cur, pre):
-                    try: return ((cur - pre) / abs(pre)) * 100 if pre != 0 else None
-                    except: return None
-                def show_qq(label, cur_val, prev_val, is_curr=True, is_pct=False):
-                    pct = calc_pct(cur_val, prev_val)
-                    display_val = fmt_num(cur_val, is_currency=is_curr, is_pct=is_pct)
-                    if is_pct: display_val = f"{cur_val*100:.2f}%" if pd.notna(cur_val) else "-"
-                    st.metric(label, display_val, f"{pct:.2f}%" if pct is not None else "-", delta_color="normal")
-
-                c_q1, c_q2, c_q3 = st.columns(3)
-                with c_q1:
-                    show_qq(txt('qq_rev'), curr.get('Total Revenue'), prev.get('Total Revenue'))
-                    show_qq(txt('qq_op_inc'), curr.get('Operating Income'), prev.get('Operating Income'))
-                with c_q2:
-                    show_qq(txt('qq_net_inc'), curr.get('Net Income'), prev.get('Net Income'))
-                    show_qq(txt('qq_op_exp'), curr.get('Operating Expense'), prev.get('Operating Expense'))
-                with c_q3:
-                    show_qq(txt('qq_eps'), curr.get('Basic EPS'), prev.get('Basic EPS'), is_curr=False)
-                    try:
-                        gm_c = curr.get('Gross Profit') / curr.get('Total Revenue')
-                        gm_p = prev.get('Gross Profit') / prev.get('Total Revenue')
-                        diff_bps = (gm_c - gm_p) * 100
-                        st.metric(txt('qq_gross_marg'), f"{gm_c*100:.2f}%", f"{diff_bps:.2f} bps")
-                    except: st.metric(txt('qq_gross_marg'), "-")
-            else: 
-                st.info("Insufficient quarterly data for Q/Q comparison.")
+            news_slot = st.empty()
+            news_slot.caption(f"⏳ {txt('loading_tab')}")
 
             st.markdown("---")
             st.subheader(txt('ai_summary_title'))
-            q_rev_disp = "N/A"
-            if q_stmt is not None and not q_stmt.empty and q_stmt.shape[1] > 0:
-                try: q_rev_disp = fmt_num(q_stmt.iloc[:, 0].get('Total Revenue'), is_currency=True)
-                except: pass
-
-            news_text = ""
-            if data['news']:
-                for n in data['news'][:5]: news_text += f"- {n.get('title', 'No Title')}\n"
-            
-            earn_context = f"Last Earnings Date: {earn_date}. Reported EPS: {act_eps if pd.notna(act_eps) else 'N/A'}. Revenue: {q_rev_disp}."
-            full_context = f"{earn_context}\nRecent Headlines:\n{news_text}"
-            
-            with st.spinner(txt('loading_ai')):
-                summary_text, _ = analyze_qualitative(data['name'], full_context, "EarningsSummary")
-                st.success(summary_text)
+            earn_slot = st.empty()
+            earn_slot.caption(f"⏳ {txt('loading_ai')}")
 
             st.markdown("---")
             st.write("### 🔗 Official Sources")
@@ -773,5 +901,104 @@ if run_analysis:
             search_url = f"https://www.google.com/search?q={query.replace(' ', '+')}"
             st.link_button(txt('source_link'), search_url)
 
+        if not stored_text: recorder.record("analysis.first_paint", time.perf_counter() - run_t0, {"ticker": final_t})
+
+        # --- FILL IN RESULTS AS THEY ARRIVE ---
+        pending = {fut: ("topic", idx) for fut, idx in topic_futures.items()}
+        pending.update({val_future: ("valuation", None), fin_future: ("financials", None), news_future: ("news", None), earn_future: ("earnings_ai", None)})
+        topics_done = 0
+        backup_used = False
+        # Topic scores are language-independent: after a language switch only the reasons are new.
+        kept_scores = stored['topic_scores'] if stored else None
+        topic_results = [None] * len(eng_topics)
+        finished = set()
+        # Past the deadline, topics still waiting on Groq show a fallback score until their answer arrives.
+        deadline = run_t0 + ANALYSIS_DEADLINE if ANALYSIS_DEADLINE and not stored_text else None
+        provisional = set()
+        waiting = set(pending)
+        while waiting:
+            done, waiting = wait(waiting, timeout=STREAM_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            # Repaint each streaming summary once per poll with its latest text, unless it already finished.
+            partial = {}
+            while not stream_q.empty():
+                kind, text = stream_q.get_nowait()
+                partial[kind] = text
+            for kind, text in partial.items():
+                if kind in finished: continue
+                if kind == "valuation":
+                    with val_slot.container(): render_val_summary(text, streaming=True)
+                else: earn_slot.success(text + " ▌")
+            for fut in done:
+                kind, idx = pending[fut]
+                if kind != "topic": finished.add(kind)
+                if kind == "topic":
+                    arrived = enumerate(fut.result()) if idx is None else [(idx, fut.result())]
+                    for i, (s, r, is_backup) in arrived:
+                        if is_backup: backup_used = True
+                        if kept_scores: s = kept_scores[i]
+                        topic_scores[i] = s
+                        topic_results[i] = (s, r, is_backup)
+                        provisional.discard(i)
+                        render_topic(topic_slots[i], display_topics[i], s, r)
+                        topics_done += 1
+                        prog_bar.progress(topics_done/len(eng_topics))
+                    if topics_done == len(eng_topics):
+                        prog_bar.empty()
+                        total_qual = qual_total(topic_scores)
+                        with score_slot.container(): render_final_score(total_qual, mult)
+                    elif provisional:
+                        with score_slot.container(): render_final_score(qual_total(topic_scores), mult, provisional=True)
+                elif kind == "valuation":
+                    val_ai_text, _ = fut.result()
+                    with val_slot.container(): render_val_summary(val_ai_text)
+                elif kind == "financials":
+                    fin_data = fut.result()
+                    with fin_slot.container(): render_financials(fin_data.get('fundamentals') or data['raw_info'], fin_data)
+                elif kind == "news":
+                    with news_slot.container(): render_news(fut.result())
+                elif kind == "earnings_ai":
+                    summary_text, _ = fut.result()
+                    earn_slot.success(summary_text)
+            if deadline and time.perf_counter() >= deadline and topics_done < len(eng_topics):
+                deadline = None
+                for i, t_eng in enumerate(eng_topics):
+                    if topic_results[i] is not None: continue
+                    s, r, note = fallback_topic(client, data, t_eng, eng_topics, lang)
+                    if kept_scores: s = kept_scores[i]
+                    topic_scores[i] = s
+                    provisional.add(i)
+                    render_topic(topic_slots[i], display_topics[i], s, r, note=note)
+                with score_slot.container(): render_final_score(qual_total(topic_scores), mult, provisional=True)
+                recorder.record("analysis.deadline", time.perf_counter() - run_t0, {"ticker": final_t, "fallback_topics": len(provisional)})
+
+        if stored_text:
+            recorder.record("analysis.redraw", time.perf_counter() - run_t0, {"ticker": final_t})
+        else:
+            if backup_used: st.toast("Backup Model used.", icon="⚠️")
+            numeric = stored or {
+                "data": data, "fin": fin_future.result(), "news": news_future.result(),
+                "topic_scores": list(topic_scores),
+            }
+            results.put(final_t, lang, numeric, {"topics": topic_results, "val": val_future.result(), "earn": earn_future.result()})
+            if "technical" in reuse:
+                action_key, reason_key, trend, rsi = prev['action'], prev['action_reason'], prev['trend'], prev['rsi']
+            else:
+                tech = data.technicals()
+                action_key, reason_key = technical_action(tech) if tech else (None, None)
+                trend, rsi = (tech['trend'], tech['rsi']) if tech else (None, None)
+            final_score = round(qual_total(topic_scores) * mult, 1)
+            score_history.record(
+                final_t, lang, fps, topics=[t[:2] for t in topic_results], topics_backup=any(t[2] for t in topic_results),
+                total_qual=qual_total(topic_scores), mult=mult, pe_pos=pos_pct, final_score=final_score, grade=grade_key(final_score),
+                action=action_key, action_reason=reason_key, trend=trend, rsi=rsi,
+            )
+            # Context tokens compaction kept out of the prompts this analysis sent to Groq.
+            recorder.record("analysis.total", time.perf_counter() - run_t0, {"ticker": final_t, "scoring_mode": scoring_mode, "saved_tokens": llm_tally["saved_tokens"]})
+
+        with history_slot.container(): render_score_history(final_t)
+
     else:
+        st.session_state.shown_ticker = None
         st.error(f"Ticker '{final_t}' not found.")
+
+render_perf_panel()
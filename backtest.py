@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from market_data import history_store
+from technicals import MIN_BARS, indicator_series, right_align, to_panel
+
+# --- TECHNICAL RULES BACKTEST ---
+# Applies the Technical tab's action rules (scoring.technical_action) to every stored day of every ticker
+# at once, on (days x tickers) arrays, and reports forward returns and hit rates per action:
+#   python -m backtest [TICKER ...] [--horizons 5,20,60] [--format table|csv|json]
+# With no tickers it uses everything in the history store. Forward returns count trading days of the
+# ticker itself, so different exchange calendars do not mix.
+HORIZONS = (5, 20, 60)
+
+# Action key -> the direction it bets on, for the hit rate (+1: price should rise, -1: fall or stay away).
+ACTION_SIDES = {
+    "act_buy_sup": 1, "act_buy_break": 1, "act_prep": 1, "act_buy_hold": 1, "act_watch_oversold": 1,
+    "act_profit": -1, "act_sell_sup": -1, "act_avoid": -1,
+}
+ACTIONS = tuple(ACTION_SIDES)
+
+def action_codes(close, volume, ind):
+    # Index into ACTIONS for every cell; same rules and precedence as scoring.technical_action.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol_ratio = np.where(ind["avg_vol"] > 0, volume / ind["avg_vol"], 1.0)
+        squeezing = ind["std_10"] < ind["std_60"] * 0.5
+        up = close > ind["sma_200"]  # "uptrend" and "weak_uptrend" both contain "uptrend"
+        support, rsi = ind["support"], ind["rsi"]
+        code = ACTIONS.index
+        return np.select(
+            [up & (close < support * 1.05), up & (vol_ratio > 1.5), up & squeezing, up & (rsi > 70), up,
+             close < support, rsi < 30],
+            [code("act_buy_sup"), code("act_buy_break"), code("act_prep"), code("act_profit"), code("act_buy_hold"),
+             code("act_sell_sup"), code("act_watch_oversold")],
+            default=code("act_avoid"),
+        )
+
+def forward_returns(close, h):
+    out = np.full(close.shape, np.nan)
+    if close.shape[0] > h:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[:-h] = close[h:] / close[:-h] - 1
+    return out
+
+def backtest_arrays(close, high, low, volume, horizons=HORIZONS):
+    # (days x tickers) arrays, NaN where a ticker has no bar. Returns one row per action plus "all".
+    c, h, l, v = right_align(*(np.asarray(x, dtype=np.float64) for x in (close, high, low, volume)))
+    ind = indicator_series(c, h, l, v)
+    # A day counts once the ticker has MIN_BARS bars up to it, as calculate_technicals requires.
+    valid = np.cumsum(~np.isnan(c), axis=0) >= MIN_BARS
+    codes = np.where(valid, action_codes(c, v, ind), -1)
+    sides = np.array([ACTION_SIDES[a] for a in ACTIONS])
+
+    flat = codes.ravel()
+    days = np.bincount(flat[flat >= 0], minlength=len(ACTIONS))
+    table = {"days": np.append(days, days.sum())}
+    for hz in horizons:
+        fwd = forward_returns(c, hz).ravel()
+        ok = (flat >= 0) & ~np.isnan(fwd)
+        k, r = flat[ok], fwd[ok]
+        n = np.bincount(k, minlength=len(ACTIONS))
+        total = np.bincount(k, weights=r, minlength=len(ACTIONS))
+        hits = np.bincount(k, weights=(np.sign(r) == sides[k]).astype(float), minlength=len(ACTIONS))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table[f"ret_{hz}d_pct"] = np.append(total / n, r.mean() if len(r) else np.nan) * 100
+            table[f"hit_{hz}d_pct"] = np.append(hits / n, (r > 0).mean() if len(r) else np.nan) * 100
+    df = pd.DataFrame(table, index=pd.Index(ACTIONS + ("all",), name="action"))
+    df["share_pct"] = df["days"] / df.loc["all", "days"] * 100 if df.loc["all", "days"] else np.nan
+    return df[["days", "share_pct"] + [c for c in df.columns if c not in ("days", "share_pct")]]
+
+def stored_tickers():
+    try: names = os.listdir(history_store.root)
+    except FileNotFoundError: return []
+    return sorted(n for n in names if history_store.meta(n))
+
+def backtest(tickers=None, horizons=HORIZONS):
+    # Full stored history of each ticker; nothing is downloaded. The "all" row's hit rate is the share
+    # of up moves, the base rate the +1 actions should beat.
+    tickers = tickers or stored_tickers()
+    frames = {t: history_store.frame(t) for t in tickers}
+    frames = {t: df for t, df in frames.items() if len(df) >= MIN_BARS}
+    if not frames: return pd.DataFrame()
+    panel = to_panel(frames)
+    df = backtest_arrays(panel["Close"], panel["High"], panel["Low"], panel["Volume"], horizons)
+    df.attrs["tickers"] = len(frames)
+    return df
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the technical action rules over the stored price history.")
+    parser.add_argument("tickers", nargs="*", help="defaults to every ticker in the history store")
+    parser.add_argument("--horizons", default=",".join(map(str, HORIZONS)), help="forward windows in trading days")
+    parser.add_argument("--format", choices=("table", "csv", "json"), default="table")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    df = backtest([t.upper() for t in args.tickers], tuple(int(h) for h in args.horizons.split(",")))
+    if df.empty:
+        print("no stored history with enough bars", file=sys.stderr)
+        return 1
+    if args.format == "csv": df.to_csv(sys.stdout)
+    elif args.format == "json": json.dump(df.reset_index().to_dict("records"), sys.stdout, indent=2, default=float)
+    else:
+        print(df.round(2).to_string())
+        print(f"\n{df.attrs['tickers']} tickers, {int(df.loc['all', 'days'])} ticker-days in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# --- OFFLINE STAND-INS FOR yfinance AND GROQ ---
+# Recorded fixtures live in benchmarks/fixtures/<TICKER>/ (see record.py); tickers without one get
+# deterministic synthetic data. Latency and error rates are set through configure().
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+settings = {"yf_latency": 0.0, "llm_latency": 0.0, "error_rate": 0.0, "seed": 0}
+_rng = random.Random(0)
+_rng_lock = threading.Lock()
+
+def configure(yf_latency=0.0, llm_latency=0.0, error_rate=0.0, seed=0):
+    settings.update(yf_latency=yf_latency, llm_latency=llm_latency, error_rate=error_rate, seed=seed)
+    _rng.seed(seed)
+
+def _delay(latency):
+    if latency: time.sleep(latency)
+
+def _maybe_fail(what):
+    with _rng_lock: fail = _rng.random() < settings["error_rate"]
+    if fail: raise RuntimeError(f"injected {what} failure")
+
+def _fixture(ticker, name):
+    path = os.path.join(FIXTURE_DIR, ticker, name)
+    return path if os.path.exists(path) else None
+
+def _exchange_tz(ticker):
+    if ticker.endswith(".HK"): return "Asia/Hong_Kong"
+    if ticker.endswith(".TO"): return "America/Toronto"
+    return "America/New_York"
+
+def _read_frame(path, tz):
+    # Keeps each row's local date and time (dropping the recorded UTC offset) in the exchange's zone,
+    # as yfinance returns it; converting through UTC would shift HKEX bars to the previous day.
+    df = pd.read_csv(path, index_col=0)
+    local = df.index.astype(str).str.replace(r"(?:Z|[+-]\d{2}:?\d{2})$", "", regex=True)
+    df.index = pd.to_datetime(local).tz_localize(tz)
+    return df
+
+def synthetic_history(ticker, periods=1260, end=None):
+    rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+    end = end or pd.Timestamp.now().normalize()
+    idx = pd.bdate_range(end=end, periods=periods, tz="America/New_York")
+    close = 50 * np.exp(np.cumsum(rng.normal(0.0004, 0.02, periods)))
+    return pd.DataFrame({
+        "Open": close * 0.998, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+        "Volume": rng.integers(1e5, 1e7, periods).astype(float), "Dividends": 0.0, "Stock Splits": 0.0,
+    }, index=idx)
+
+class FakeTicker:
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    def _get(self, what):
+        _delay(settings["yf_latency"])
+        _maybe_fail(f"yfinance {what}")
+
+    @property
+    def info(self):
+        self._get("info")
+        path = _fixture(self.ticker, "info.json")
+        if path:
+            with open(path) as f: return json.load(f)
+        rng = np.random.default_rng(zlib.crc32(self.ticker.encode()))
+        price = float(synthetic_history(self.ticker)["Close"].iloc[-1])
+        eps = round(price / rng.uniform(8, 40), 2)
+        return {
+            "currentPrice": price, "forwardEps": eps, "trailingEps": eps * 0.9, "forwardPE": price / eps,
+            "trailingPE": price / (eps * 0.9), "longName": f"{self.ticker} Holdings", "industry": "Synthetic",
+            "currency": "USD", "longBusinessSummary": f"{self.ticker} designs and sells products worldwide. " * 40,
+            "marketCap": price * 1e9, "priceToBook": rng.uniform(1, 10), "returnOnEquity": rng.uniform(-0.1, 0.4),
+            "profitMargins": rng.uniform(-0.05, 0.35), "grossMargins": rng.uniform(0.2, 0.7),
+            "revenueGrowth": rng.uniform(-0.1, 0.4), "dividendYield": rng.uniform(0, 0.04),
+        }
+
+    def history(self, period=None, start=None, **kwargs):
+        self._get("history")
+        path = _fixture(self.ticker, "history.csv")
+        df = _read_frame(path, _exchange_tz(self.ticker)) if path else synthetic_history(self.ticker)
+        if start is not None: df = df[df.index.tz_localize(None).normalize() >= pd.Timestamp(start)]
+        return df
+
+    @property
+    def dividends(self):
+        self._get("dividends")
+        path = _fixture(self.ticker, "dividends.csv")
+        if path: return _read_frame(path, _exchange_tz(self.ticker)).iloc[:, 0]
+        idx = pd.date_range(end=pd.Timestamp.now().normalize(), periods=8, freq="QS", tz="America/New_York")
+        return pd.Series(0.25, index=idx, name="Dividends")
+
+    @property
+    def earnings_dates(self):
+        self._get("earnings_dates")
+        path = _fixture(self.ticker, "earnings_dates.csv")
+        if path: return _read_frame(path, _exchange_tz(self.ticker))
+        idx = pd.date_range(end=pd.Timestamp.now().normalize() - pd.Timedelta(days=20), periods=12, freq="91D", tz="America/New_York")[::-1]
+        return pd.DataFrame({"EPS Estimate": 1.0, "Reported EPS": 1.1, "Surprise(%)": 10.0}, index=idx)
+
+    @property
+    def quarterly_income_stmt(self):
+        self._get("quarterly_income_stmt")
+        path = _fixture(self.ticker, "quarterly_income_stmt.csv")
+        if path: return pd.read_csv(path, index_col=0)
+        rows = ["Total Revenue", "Operating Income", "Net Income", "Basic EPS", "Diluted EPS", "Operating Expense", "Gross Profit"]
+        cols = pd.date_range(end=pd.Timestamp.now().normalize() - pd.Timedelta(days=45), periods=5, freq="91D")[::-1]
+        base = np.array([1e9, 2e8, 1.5e8, 1.2, 1.2, 3e8, 5e8])
+        return pd.DataFrame({c: base * (1 - 0.03 * i) for i, c in enumerate(cols)}, index=rows)
+
+    @property
+    def news(self):
+        self._get("news")
+        path = _fixture(self.ticker, "news.json")
+        if path:
+            with open(path) as f: return json.load(f)
+        return [{"title": f"{self.ticker} headline {i}"} for i in range(8)]
+
+def fake_download(tickers, period=None, start=None, group_by="ticker", **kwargs):
+    _delay(settings["yf_latency"])
+    if isinstance(tickers, str): tickers = [tickers]
+    frames = {t: FakeTicker(t).history(period=period, start=start) for t in tickers}
+    return pd.concat(frames, axis=1)
+
+# --- FAKE GROQ CLIENT ---
+class _Message:
+    def __init__(self, content): self.content = content
+
+class _Choice:
+    def __init__(self, content): self.message = _Message(content)
+
+def _usage(content, prompt):
+    return type("Usage", (), {
+        "prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+        "total_tokens": len(prompt) // 4 + len(content) // 4,
+    })()
+
+class _Response:
+    def __init__(self, content, prompt):
+        self.choices = [_Choice(content)]
+        self.usage = _usage(content, prompt)
+
+class _Chunk:
+    def __init__(self, delta, usage=None):
+        self.choices = [type("ChunkChoice", (), {"delta": _Message(delta)})()]
+        self.x_groq = type("XGroq", (), {"usage": usage})() if usage else None
+
+def _stream(content, prompt):
+    # Word-sized chunks; the configured latency is spread across them, with the last chunk carrying usage.
+    words = re.findall(r"\S+\s*", content)
+    for i, w in enumerate(words):
+        _delay(settings["llm_latency"] / max(len(words), 1))
+        yield _Chunk(w, _usage(content, prompt) if i == len(words) - 1 else None)
+
+class _Completions:
+    def create(self, model, messages, stream=False, **kwargs):
+        if not stream: _delay(settings["llm_latency"])
+        _maybe_fail(f"groq {model}")
+        prompt = messages[-1]["content"]
+        score = (zlib.crc32(prompt.encode()) % 41) / 10
+        if kwargs.get("response_format"):
+            topics = re.findall(r'"([^"]+)"', prompt.split("Context:")[0])
+            content = json.dumps({t: {"score": round((score + i) % 4.1, 1), "reason": f"Synthetic reason for {t}."} for i, t in enumerate(topics)})
+        elif "SCORE|REASON" in prompt:
+            content = f"{score}|Synthetic reason."
+        else:
+            content = "- Synthetic summary line one.\n- Synthetic summary line two."
+        return _stream(content, prompt) if stream else _Response(content, prompt)
+
+class FakeGroq:
+    def __init__(self, api_key=None, **kwargs):
+        self.api_key = api_key
+        self.chat = type("Chat", (), {"completions": _Completions()})()
+
+def install():
+    # Patch the library entry points the app imports (`yf.Ticker`, `yf.download`, `groq.Groq`).
+    import groq
+    import yfinance as yf
+    yf.Ticker = FakeTicker
+    yf.download = fake_download
+    groq.Groq = FakeGroq
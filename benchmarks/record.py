@@ -0,0 +1,23 @@
+import argparse
+import asyncio
+
+from benchmarks.fakes import FIXTURE_DIR
+from providers import YFinanceProvider, export
+
+# Records live yfinance responses as fixtures for the offline benchmarks, in the layout the local file
+# provider reads (so the same directory also serves VIP_DATA_PROVIDER=local:<dir>):
+#   python -m benchmarks.record NVDA AAPL 0700.HK [--out DIR]
+
+async def record(tickers, out):
+    provider = YFinanceProvider()
+    missing = await asyncio.gather(*(export(provider, t, out) for t in tickers))
+    for ticker, kinds in zip(tickers, missing):
+        for kind, reason in kinds.items(): print(f"{ticker}: no {kind} ({reason})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record yfinance fixtures for the offline benchmarks.")
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--out", default=FIXTURE_DIR)
+    args = parser.parse_args()
+    asyncio.run(record(args.tickers, args.out))
+    print(f"recorded {', '.join(args.tickers)}")
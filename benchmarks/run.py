@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Caches must point at a scratch directory before the app modules create them.
+os.environ.setdefault("VIP_CACHE_DIR", tempfile.mkdtemp(prefix="vip-bench-"))
+# The fake backend has no quota, so the shared Groq rate budget is off unless set explicitly.
+os.environ.setdefault("VIP_GROQ_RPM", "0")
+os.environ.setdefault("VIP_GROQ_TPM", "0")
+
+from benchmarks import fakes
+fakes.install()
+
+import llm
+import market_data
+from scoring import QUAL_TOPICS
+from technicals import calculate_technicals, panel_technicals, to_panel
+
+# Offline benchmark suite: python -m benchmarks.run [--update-baseline]
+# Every stage runs against benchmarks.fakes, so no network access or API key is needed.
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(BENCH_DIR), "app.py")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUT = os.path.join(BENCH_DIR, "latest.json")
+PARITY_FIELDS = ("rsi", "support", "resistance", "vol_ratio", "last_price")
+
+def reset_market():
+    market_data.market_cache.clear()
+    shutil.rmtree(market_data.history_store.root, ignore_errors=True)
+
+def reset_llm():
+    llm.llm_cache.clear()
+
+def timed(fn, repeat, setup=None):
+    # setup() runs untimed before each sample; its return value is passed to fn.
+    samples = []
+    for _ in range(repeat):
+        ctx = setup() if setup else None
+        t0 = time.perf_counter()
+        fn(ctx) if setup else fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))], 3),
+        "min_ms": round(samples[0], 3), "runs": repeat,
+    }
+
+def check_panel_parity(frames):
+    # panel_technicals must give every ticker the same indicators as calculate_technicals on its own
+    # frame, including tickers with shorter histories (ragged panels) and too few bars to score.
+    panel = to_panel(frames)
+    rows = panel_technicals(panel["Close"], panel["High"], panel["Low"], panel["Volume"])
+    bad = []
+    for sym, df in frames.items():
+        ref = calculate_technicals(df)
+        if ref is None or sym not in rows.index:
+            if (ref is None) != (sym not in rows.index): bad.append(sym)
+            continue
+        row = rows.loc[sym]
+        same = row["trend"] == ref["trend"] and bool(row["is_squeezing"]) == bool(ref["is_squeezing"])
+        if not (same and all(np.isclose(row[f], ref[f], rtol=1e-9, equal_nan=True) for f in PARITY_FIELDS)): bad.append(sym)
+    if bad: raise RuntimeError(f"panel_technicals differs from calculate_technicals for {len(bad)} tickers: {bad[:10]}")
+
+def bench_stages(args):
+    ticker = args.ticker
+    client = fakes.FakeGroq(api_key="bench")
+    data = market_data.get_stock_data(ticker) or {}
+    summary = data.get("summary", "No summary available.")
+    name = data.get("name", ticker)
+    hist = fakes.synthetic_history(ticker)
+    frames = {f"T{i}": fakes.synthetic_history(f"T{i}") for i in range(args.panel_size)}
+    panel = to_panel(frames)
+    ragged = {f"R{n}": fakes.synthetic_history(f"R{n}", periods=n) for n in (150, 201, 400)}
+
+    def per_topic():
+        with ThreadPoolExecutor(max_workers=len(QUAL_TOPICS)) as pool:
+            list(pool.map(lambda t: llm.score_topic(client, name, summary, t), QUAL_TOPICS))
+
+    def app_setup():
+        from streamlit.testing.v1 import AppTest
+        reset_market(); reset_llm()
+        at = AppTest.from_file(APP_PATH, default_timeout=120)
+        at.secrets["GROQ_API_KEY"] = "bench"
+        at.run()
+        next(t for t in at.text_input if t.label == "T").set_value(ticker)
+        return at
+
+    def app_run(at):
+        next(b for b in at.button if b.label == "Analyze Stock").click()
+        at.run()
+        if at.exception: raise RuntimeError(f"app raised: {at.exception}")
+
+    stages = {
+        "get_stock_data.cold": lambda: timed(lambda _: market_data.get_stock_data(ticker), args.repeat, setup=reset_market),
+        "get_stock_data.warm": lambda: timed(lambda: market_data.get_stock_data(ticker), args.repeat),
+        "calculate_technicals": lambda: timed(lambda: calculate_technicals(hist), args.repeat),
+        "panel_technicals": lambda: check_panel_parity({**frames, **ragged}) or timed(lambda: panel_technicals(panel["Close"], panel["High"], panel["Low"], panel["Volume"]), args.repeat),
+        "topic_scoring.per_topic": lambda: timed(lambda _: per_topic(), args.repeat, setup=reset_llm),
+        "topic_scoring.batched": lambda: timed(lambda _: llm.score_topics_batched(client, name, summary, QUAL_TOPICS), args.repeat, setup=reset_llm),
+        "app.full_run": lambda: timed(app_run, args.app_repeat, setup=app_setup),
+    }
+    wanted = args.stages.split(",") if args.stages else list(stages)
+    results = {}
+    for stage in wanted:
+        results[stage] = stages[stage]()
+        print(f"{stage:<26} median {results[stage]['median_ms']:>10.2f} ms   p95 {results[stage]['p95_ms']:>10.2f} ms")
+    return results
+
+def compare(results, baseline, threshold, min_delta_ms):
+    regressions = []
+    for stage, res in results.items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base: continue
+        delta = res["median_ms"] - base["median_ms"]
+        if delta > base["median_ms"] * threshold and delta > min_delta_ms:
+            regressions.append(f"{stage}: {base['median_ms']:.2f} -> {res['median_ms']:.2f} ms (+{delta / base['median_ms'] * 100:.0f}%)")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks with fake yfinance and Groq backends.")
+    parser.add_argument("--ticker", default="NVDA")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--app-repeat", type=int, default=3)
+    parser.add_argument("--panel-size", type=int, default=500)
+    parser.add_argument("--stages", help="comma-separated subset of stages to run")
+    parser.add_argument("--yf-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability that any fake call raises")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown per stage")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    fakes.configure(args.yf_latency_ms / 1000, args.llm_latency_ms / 1000, args.error_rate, args.seed)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), "machine": platform.machine(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "update_baseline")},
+        "stages": bench_stages(args),
+    }
+    with open(args.out, "w") as f: json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f: json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("no baseline yet; run with --update-baseline to create one")
+        return 0
+    with open(args.baseline) as f: baseline = json.load(f)
+    regressions = compare(report["stages"], baseline, args.threshold, args.min_delta_ms)
+    for r in regressions: print(f"REGRESSION {r}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
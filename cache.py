@@ -0,0 +1,78 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+# --- DISK CACHE SETTINGS ---
+CACHE_DIR = os.environ.get("VIP_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+MISS = object()
+
+class DiskCache:
+    # SQLite-backed key/value cache with per-entry TTL, a size cap and LRU eviction. One file is shared
+    # by every Streamlit session and survives server restarts. Values are pickled; `kind` groups entries
+    # so hit/miss counters can be reported per data type.
+    def __init__(self, name, max_bytes):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.path = os.path.join(CACHE_DIR, f"{name}.sqlite")
+        self.max_bytes = max_bytes
+        self.hits, self.misses = {}, {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, kind TEXT, value BLOB, size INTEGER,"
+            " created REAL, expires REAL, accessed REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)")
+        self._db.commit()
+
+    def get(self, key, kind="default"):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+                return MISS
+            self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl, kind="default"):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, value, size, created, expires, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, blob, len(blob), now, now + ttl, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+            self.hits, self.misses = {}, {}
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM entries WHERE expires < ?", (now,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes: return
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY accessed ASC").fetchall():
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes: break
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "entries": entries, "bytes": size,
+            "hits": sum(self.hits.values()), "misses": sum(self.misses.values()),
+            "by_kind": {k: (self.hits.get(k, 0), self.misses.get(k, 0)) for k in sorted(set(self.hits) | set(self.misses))},
+        }
@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from market_data import history_store, statement_eps
+from pe_history import asof, ttm_eps
+
+# --- LONG-RANGE PRICE CHART ---
+# The Technical tab's long-range mode plots the whole stored history (Close, SMA-50, SMA-200 and the
+# prices at the historical low and high PE). The frame is downsampled on the server with
+# Largest-Triangle-Three-Buckets, so the browser always gets about CHART_POINTS rows however long
+# the history is.
+CHART_POINTS = int(os.environ.get("VIP_CHART_POINTS", "800"))  # roughly the chart's width in pixels
+
+def lttb(x, y, n):
+    # Indices of the n points LTTB keeps (always the first and last). Each bucket keeps the point
+    # forming the largest triangle with the point kept before it and the next bucket's mean. That
+    # choice is sequential, so there is one loop step per bucket. The bucket means come from one
+    # reduceat pass, and each step's areas are a single vector operation.
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    size = len(x)
+    if n >= size or n < 3: return np.arange(size)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)  # n - 2 buckets over the interior points
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    # The point after the last bucket is the final point itself.
+    next_x, next_y = np.append(mean_x[1:], x[-1]), np.append(mean_y[1:], y[-1])
+
+    keep = np.empty(n, dtype=np.int64)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for b, (lo, hi) in enumerate(zip(edges[:-1], edges[1:])):
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - next_x[b]) * (by - y[a]) - (x[a] - bx) * (next_y[b] - y[a]))
+        a = keep[b + 1] = lo + int(np.argmax(area))
+    return keep
+
+def long_range_frame(ticker, min_pe, max_pe, eps=None, basis="current_eps", points=CHART_POINTS):
+    # Downsampled full-history frame for st.line_chart, plus the number of stored bars. The PE band uses
+    # the EPS the PE range was built on (`basis` from the PE index): the TTM EPS known on each day for
+    # a "ttm" range, otherwise the current EPS.
+    hist = history_store.frame(ticker)
+    if hist.empty: return pd.DataFrame(), 0
+    close = hist["Close"]
+    frame = pd.DataFrame({
+        "Close": close,
+        "SMA_50": close.rolling(window=50).mean(),
+        "SMA_200": close.rolling(window=200).mean(),
+    })
+    if basis == "ttm":
+        band_eps = asof(hist.index.values.astype("datetime64[ns]").view("i8"), ttm_eps(statement_eps(ticker)))
+    else:
+        band_eps = np.full(len(hist), eps if eps and eps > 0 else np.nan)
+    if min_pe and max_pe:
+        band_eps = np.where(band_eps > 0, band_eps, np.nan)
+        frame["PE_low"], frame["PE_high"] = band_eps * min_pe, band_eps * max_pe
+
+    # x is the bar number, so weekends and holidays do not stretch the buckets.
+    keep = lttb(np.arange(len(frame)), close.to_numpy(), points)
+    return frame.iloc[keep], len(frame)
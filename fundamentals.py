@@ -0,0 +1,164 @@
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+
+from cache import CACHE_DIR
+
+# --- FUNDAMENTALS STORE ---
+# A daily snapshot of the Financials-tab fields for every ticker load_core has built (interactive
+# analyses, the warmer, the screener and the pipeline). `daily` keeps one row per (ticker, day);
+# `latest` keeps each ticker's newest row with an index per field, so universe-wide filters run in
+# SQLite without touching the network:
+#   python -m fundamentals "roe>0.2" "pe<=q25"
+# A value written as qNN is that percentile of the field across `latest`.
+FUNDAMENTALS_PATH = os.path.join(CACHE_DIR, "fundamentals.sqlite")
+FIELDS = (
+    "currentPrice", "marketCap", "enterpriseValue", "trailingPE", "forwardPE", "pegRatio",
+    "priceToSalesTrailing12Months", "priceToBook", "beta", "profitMargins", "grossMargins",
+    "returnOnAssets", "returnOnEquity", "trailingEps", "totalRevenue", "revenueGrowth", "dividendYield",
+    "targetMeanPrice", "lastFiscalYearEnd",
+)
+# Short names accepted by query() and the CLI.
+ALIASES = {
+    "price": "currentPrice", "mcap": "marketCap", "ev": "enterpriseValue", "pe": "trailingPE",
+    "fpe": "forwardPE", "peg": "pegRatio", "ps": "priceToSalesTrailing12Months", "pb": "priceToBook",
+    "margin": "profitMargins", "gross": "grossMargins", "roa": "returnOnAssets", "roe": "returnOnEquity",
+    "eps": "trailingEps", "rev": "totalRevenue", "growth": "revenueGrowth", "div": "dividendYield", "target": "targetMeanPrice",
+}
+OPS = ("<=", ">=", "<", ">", "=")
+RULE_RE = re.compile(r"^\s*(\w+)\s*(<=|>=|<|>|=)\s*(q\d+(?:\.\d+)?|[-+]?[\d.]+(?:e[-+]?\d+)?)\s*$", re.I)
+
+def to_number(v):
+    # yfinance mixes in strings ("Infinity") and NaN for missing values; those store as NULL.
+    try: v = float(v)
+    except (TypeError, ValueError): return None
+    return v if math.isfinite(v) else None
+
+def field_name(name):
+    name = ALIASES.get(name.lower(), name)
+    if name not in FIELDS: raise ValueError(f"unknown field: {name}")
+    return name
+
+def parse_rule(text):
+    # "roe>0.2" -> ("returnOnEquity", ">", 0.2); "pe<=q25" -> ("trailingPE", "<=", "q25").
+    m = RULE_RE.match(text)
+    if not m: raise ValueError(f"bad rule: {text!r} (expected e.g. roe>0.2 or pe<=q25)")
+    field, op, value = m.groups()
+    return field_name(field), op, value.lower() if value[0] in "qQ" else float(value)
+
+class FundamentalsStore:
+    def __init__(self, path=FUNDAMENTALS_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        cols = "".join(f', "{f}" REAL' for f in FIELDS)
+        for table in ("daily", "latest"):
+            key = "ticker, day" if table == "daily" else "ticker"
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (ticker TEXT, day TEXT, currency TEXT, updated REAL{cols},"
+                f" PRIMARY KEY ({key})) WITHOUT ROWID"
+            )
+            # Fields added after a store was created become new (NULL) columns.
+            have = {r[1] for r in self._db.execute(f"PRAGMA table_info({table})")}
+            for f in FIELDS:
+                if f not in have: self._db.execute(f'ALTER TABLE {table} ADD COLUMN "{f}" REAL')
+        for f in FIELDS: self._db.execute(f'CREATE INDEX IF NOT EXISTS "idx_latest_{f}" ON latest("{f}")')
+        self._db.commit()
+
+    def record(self, ticker, info, day=None):
+        # Today's row is overwritten by later loads the same day.
+        row = (ticker, (day or date.today()).isoformat(), info.get("currency"), time.time()) + tuple(to_number(info.get(f)) for f in FIELDS)
+        names = ", ".join(f'"{c}"' for c in ("ticker", "day", "currency", "updated") + FIELDS)
+        marks = ", ".join("?" * len(row))
+        with self._lock:
+            self._db.execute(f"INSERT OR REPLACE INTO daily ({names}) VALUES ({marks})", row)
+            self._db.execute(
+                f"INSERT INTO latest ({names}) VALUES ({marks}) ON CONFLICT(ticker) DO UPDATE SET "
+                + ", ".join(f'"{c}" = excluded."{c}"' for c in ("day", "currency", "updated") + FIELDS)
+                + " WHERE excluded.day >= latest.day", row,
+            )
+            self._db.commit()
+
+    def latest(self, ticker):
+        # The ticker's newest snapshot as an info-style dict, or None if it was never recorded.
+        with self._lock:
+            cur = self._db.execute("SELECT * FROM latest WHERE ticker = ?", (ticker,))
+            row = cur.fetchone()
+            names = [d[0] for d in cur.description]
+        return dict(zip(names, row)) if row else None
+
+    def history(self, ticker):
+        with self._lock:
+            return pd.read_sql_query("SELECT * FROM daily WHERE ticker = ? ORDER BY day", self._db, params=(ticker,), index_col="day")
+
+    def quantile(self, field, q):
+        # Nearest-rank percentile over tickers that have the field, read off the field's index.
+        field = field_name(field)
+        with self._lock:
+            n = self._db.execute(f'SELECT COUNT("{field}") FROM latest').fetchone()[0]
+            if not n: return None
+            offset = min(n - 1, max(0, math.ceil(q / 100 * n) - 1))
+            return self._db.execute(
+                f'SELECT "{field}" FROM latest WHERE "{field}" IS NOT NULL ORDER BY "{field}" LIMIT 1 OFFSET ?', (offset,)
+            ).fetchone()[0]
+
+    def query(self, rules, max_age_days=None):
+        # rules: ("field", op, value) tuples or "roe>0.2" strings, all of which must hold.
+        # Returns the matching tickers' latest rows, indexed by ticker.
+        where, params = [], []
+        for rule in rules:
+            field, op, value = parse_rule(rule) if isinstance(rule, str) else (field_name(rule[0]), rule[1], rule[2])
+            if op not in OPS: raise ValueError(f"bad operator: {op}")
+            if isinstance(value, str): value = self.quantile(field, float(value[1:]))
+            if value is None: where.append("0")
+            else:
+                where.append(f'"{field}" {op} ?')
+                params.append(value)
+        if max_age_days is not None:
+            where.append("day >= ?")
+            params.append((pd.Timestamp.today().normalize() - pd.Timedelta(days=max_age_days)).date().isoformat())
+        sql = "SELECT * FROM latest" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY ticker"
+        with self._lock:
+            return pd.read_sql_query(sql, self._db, params=params, index_col="ticker")
+
+    def stats(self):
+        with self._lock:
+            tickers, = self._db.execute("SELECT COUNT(*) FROM latest").fetchone()
+            rows, = self._db.execute("SELECT COUNT(*) FROM daily").fetchone()
+        return {"tickers": tickers, "rows": rows}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Filter every stored ticker by its latest fundamentals.")
+    parser.add_argument("rules", nargs="*", help='e.g. "roe>0.2" "pe<=q25"; fields: ' + ", ".join(ALIASES))
+    parser.add_argument("--max-age", type=int, help="ignore tickers last recorded more than this many days ago")
+    parser.add_argument("--format", choices=("table", "csv", "json"), default="table")
+    args = parser.parse_args(argv)
+
+    store = FundamentalsStore()
+    t0 = time.perf_counter()
+    try: df = store.query(args.rules, args.max_age)
+    except ValueError as e: parser.error(str(e))
+    elapsed = time.perf_counter() - t0
+    # The table shows the filtered fields first, then a few headline ones.
+    shown = [parse_rule(r)[0] for r in args.rules] + ["currentPrice", "marketCap", "trailingPE", "returnOnEquity"]
+    cols = ["day", "currency"] + list(dict.fromkeys(shown))
+    if args.format == "csv": df.to_csv(sys.stdout)
+    elif args.format == "json": json.dump(df.reset_index().to_dict("records"), sys.stdout, indent=2, default=float)
+    else:
+        print(df[cols].to_string() if len(df) else "no matches")
+        print(f"\n{len(df)}/{store.stats()['tickers']} tickers in {elapsed * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
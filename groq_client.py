@@ -0,0 +1,183 @@
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import groq
+
+# --- SHARED GROQ CLIENT LAYER ---
+# Module-level state, so every Streamlit session in the process shares one pooled HTTP client per API key
+# and one request/token budget per model, instead of each rerun racing the others into Groq's limits.
+GROQ_RPM = int(os.environ.get("VIP_GROQ_RPM", "30"))      # requests per minute per model; 0 disables
+GROQ_TPM = int(os.environ.get("VIP_GROQ_TPM", "6000"))    # tokens per minute per model; 0 disables
+RETRIES = int(os.environ.get("VIP_GROQ_RETRIES", "3"))    # extra attempts after a transient error (see is_transient)
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+BREAKER_THRESHOLD = int(os.environ.get("VIP_GROQ_BREAKER_THRESHOLD", "3"))
+BREAKER_COOLDOWN = float(os.environ.get("VIP_GROQ_BREAKER_COOLDOWN", "60"))
+
+class RateLimited(Exception):
+    # The local budget for a model did not free up within the allowed wait; no request was sent.
+    pass
+
+class CircuitOpen(Exception):
+    pass
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.stamp = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_for(self, amount):
+        # Seconds until `amount` is available (requests larger than the bucket wait for a full bucket).
+        return max(0.0, min(amount, self.capacity) - self.level) / self.rate
+
+class ModelLimiter:
+    # Requests-per-minute and tokens-per-minute buckets for one model. Tokens are reserved up front from
+    # an estimate and settled against the reported usage once the response arrives.
+    def __init__(self, rpm, tpm):
+        self._lock = threading.Lock()
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+
+    def acquire(self, tokens, max_wait):
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                buckets = [(b, n) for b, n in ((self.requests, 1), (self.tokens, tokens)) if b is not None]
+                for b, _ in buckets: b.refill(now)
+                wait = max((b.wait_for(n) for b, n in buckets), default=0.0)
+                if wait == 0.0:
+                    for b, n in buckets: b.level -= min(n, b.capacity)
+                    return True
+            if now + wait > deadline: return False
+            time.sleep(min(wait, 1.0))
+
+    def headroom(self):
+        # Fraction of the tightest bucket available right now; 1.0 when unlimited.
+        with self._lock:
+            now = time.monotonic()
+            levels = []
+            for b in (self.requests, self.tokens):
+                if b is None: continue
+                b.refill(now)
+                levels.append(b.level / b.capacity)
+            return min(levels, default=1.0)
+
+    def settle(self, reserved, used):
+        if self.tokens is None or used is None: return
+        with self._lock:
+            self.tokens.refill(time.monotonic())
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + reserved - used)
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive failures. While open, calls are refused for `cooldown` seconds;
+    # after that a single probe is let through per cool-down window until one succeeds.
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold, self.cooldown = threshold, cooldown
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.open_until = 0.0
+
+    def allow(self):
+        with self._lock:
+            if self.failures < self.threshold: return True
+            now = time.monotonic()
+            if now < self.open_until: return False
+            self.open_until = now + self.cooldown
+            return True
+
+    def record_success(self):
+        with self._lock: self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold: self.open_until = time.monotonic() + self.cooldown
+
+    def remaining(self):
+        # Seconds until the next probe, or 0 when closed.
+        with self._lock:
+            if self.failures < self.threshold: return 0.0
+            return max(0.0, self.open_until - time.monotonic())
+
+_lock = threading.Lock()
+_clients = {}
+_limiters = {}
+_breakers = {}
+
+def get_client(api_key):
+    # One Groq client (and so one pooled httpx connection pool) per API key for the whole process.
+    # SDK retries are off because chat() retries the same transient errors with its own backoff.
+    with _lock:
+        if api_key not in _clients: _clients[api_key] = groq.Groq(api_key=api_key, max_retries=0)
+        return _clients[api_key]
+
+def limiter(model):
+    with _lock: return _limiters.setdefault(model, ModelLimiter(GROQ_RPM, GROQ_TPM))
+
+def breaker(model):
+    with _lock: return _breakers.setdefault(model, CircuitBreaker())
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def is_transient(e):
+    # The errors the SDK itself would retry: connection failures and timeouts, 408, 409, 429 and 5xx.
+    if isinstance(e, groq.APIConnectionError): return True
+    status = getattr(e, "status_code", None)
+    return isinstance(e, groq.RateLimitError) or status in (408, 409, 429) or (status is not None and status >= 500)
+
+def backoff_delay(e, attempt):
+    # Honors Retry-After when the server sends one, otherwise exponential backoff with full jitter.
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try: return min(BACKOFF_MAX, float(headers.get("retry-after")))
+    except (TypeError, ValueError): return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def collect_stream(chunks, on_text):
+    # Calls on_text with the text so far after every chunk and returns a response shaped like a
+    # non-streamed one. Groq reports usage on the final chunk under x_groq.
+    text, usage = "", None
+    for chunk in chunks:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            text += delta
+            on_text(text)
+        usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None) or usage
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+
+def chat(client, model, prompt, max_tokens, max_wait, use_breaker=False, on_text=None, **kwargs):
+    # Single-message chat completion through the shared budget for `model`. Raises CircuitOpen or
+    # RateLimited without sending anything when the model is unavailable; API errors are re-raised.
+    # Every attempt, retries included, reserves its own request and tokens from the budget; a failed
+    # attempt keeps its reservation. With on_text the completion is streamed (see collect_stream).
+    circuit = breaker(model) if use_breaker else None
+    if circuit is not None and not circuit.allow(): raise CircuitOpen(f"{model}: circuit open after repeated failures")
+    budget = limiter(model)
+    reserved = estimate_tokens(prompt) + max_tokens
+    for attempt in range(RETRIES + 1):
+        if not budget.acquire(reserved, max_wait): raise RateLimited(f"{model}: local rate budget exhausted")
+        try:
+            resp = client.chat.completions.create(
+                model=model, messages=[{"role": "user", "content": prompt}], max_tokens=max_tokens,
+                stream=on_text is not None, **kwargs
+            )
+            if on_text is not None: resp = collect_stream(resp, on_text)
+        except Exception as e:
+            if not is_transient(e) or attempt == RETRIES:
+                if circuit is not None: circuit.record_failure()
+                raise
+            time.sleep(backoff_delay(e, attempt))
+            continue
+        if circuit is not None: circuit.record_success()
+        usage = getattr(resp, "usage", None)
+        budget.settle(reserved, getattr(usage, "total_tokens", None) or reserved)
+        return resp
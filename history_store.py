@@ -0,0 +1,168 @@
+import contextlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache import CACHE_DIR
+
+try: import fcntl
+except ImportError: fcntl = None  # Windows: writers are serialized within the process only
+
+# --- OHLCV HISTORY STORE ---
+# One directory per ticker holding a raw little-endian file per column plus meta.json. Files are only ever
+# appended to (the last, possibly intraday, bar is overwritten in place), so readers can memory-map them
+# safely. A split or dividend re-bases the adjusted series; that writes a new version directory and
+# switches meta.json over atomically. The old directory is deleted VERSION_GRACE later, so readers that
+# read meta.json before the switch can still open its files. The warmer and pipeline workers write from
+# other processes, so a refresh holds an flock on the ticker's lock file as well as a thread lock.
+HISTORY_DIR = os.path.join(CACHE_DIR, "history")
+COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+INITIAL_PERIOD = "5y"
+VERSION_GRACE = 15 * 60  # seconds a replaced version directory is kept
+
+def normalize_bars(df):
+    idx = df.index.tz_localize(None) if df.index.tz is not None else df.index
+    out = df.set_axis(idx.normalize())
+    out = out[~out.index.duplicated(keep="last")].sort_index()
+    return out
+
+class HistoryStore:
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _dir(self, ticker):
+        return os.path.join(self.root, ticker.replace("/", "_"))
+
+    def _lock(self, ticker):
+        with self._guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    @contextlib.contextmanager
+    def _locked(self, ticker):
+        with self._lock(ticker):
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self._dir(ticker), exist_ok=True)
+            with open(os.path.join(self._dir(ticker), ".lock"), "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try: yield
+                finally: fcntl.flock(f, fcntl.LOCK_UN)
+
+    def meta(self, ticker):
+        try:
+            with open(os.path.join(self._dir(ticker), "meta.json")) as f: return json.load(f)
+        except (FileNotFoundError, ValueError): return None
+
+    def _write_meta(self, ticker, meta):
+        path = os.path.join(self._dir(ticker), "meta.json")
+        with open(path + ".tmp", "w") as f: json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def _col_path(self, ticker, meta, col):
+        return os.path.join(self._dir(ticker), f"v{meta['version']}", f"{col}.bin")
+
+    def columns(self, ticker):
+        # Read-only memory maps bounded by the row count in meta, so a concurrent append is never half-read.
+        # A version deleted between reading meta and opening its files is retried once on the new meta.
+        for attempt in range(2):
+            meta = self.meta(ticker)
+            if not meta or not meta["rows"]: return None
+            rows = meta["rows"]
+            try:
+                cols = {"Date": np.memmap(self._col_path(ticker, meta, "Date"), dtype="<i8", mode="r", shape=(rows,))}
+                for col in COLUMNS:
+                    cols[col] = np.memmap(self._col_path(ticker, meta, col), dtype="<f8", mode="r", shape=(rows,))
+                return cols
+            except FileNotFoundError:
+                if attempt: raise
+
+    def frame(self, ticker, tail=None):
+        # Only the requested tail is copied out of the maps.
+        cols = self.columns(ticker)
+        if cols is None: return pd.DataFrame(columns=list(COLUMNS), dtype="float64")
+        sl = slice(-tail, None) if tail else slice(None)
+        return pd.DataFrame({c: np.array(cols[c][sl]) for c in COLUMNS}, index=pd.DatetimeIndex(np.array(cols["Date"][sl]).astype("datetime64[ns]"), name="Date"))
+
+    def anchor(self, ticker):
+        # Second-to-last stored bar: the latest one known to be complete. Refreshes fetch from here.
+        cols = self.columns(ticker)
+        if cols is None or len(cols["Date"]) < 2: return None
+        return pd.Timestamp(int(cols["Date"][-2]))
+
+    def is_stale(self, ticker, max_age):
+        meta = self.meta(ticker)
+        return meta is None or time.time() - meta["checked"] >= max_age
+
+    def refresh(self, ticker, fetch, max_age):
+        # fetch(start) returns bars from `start` (a Timestamp), or the initial history when start is None.
+        with self._locked(ticker):
+            self._prune(ticker)
+            if not self.is_stale(ticker, max_age): return self.meta(ticker)
+            anchor = self.anchor(ticker)
+            if anchor is None: return self._rewrite(ticker, fetch(None))
+
+            new = fetch(anchor)
+            meta = self.meta(ticker)
+            if new is None or new.empty:
+                meta["checked"] = time.time(); self._write_meta(ticker, meta)
+                return meta
+            new = normalize_bars(new)
+            cols = self.columns(ticker)
+
+            # A dividend or split after the anchor, or a changed anchor close, means every stored
+            # adjusted price is stale: re-download the full history.
+            after = new[new.index > anchor]
+            actions = [c for c in ("Dividends", "Stock Splits") if c in after.columns]
+            rebased = anchor not in new.index or not np.isclose(new.loc[anchor, "Close"], cols["Close"][-2], rtol=1e-6)
+            if actions and (after[actions].fillna(0) != 0).any().any(): rebased = True
+            if rebased: return self._rewrite(ticker, fetch(None))
+            if after.empty:
+                meta["checked"] = time.time(); self._write_meta(ticker, meta)
+                return meta
+            at = int(np.searchsorted(cols["Date"], after.index[0].value, side="left"))
+            return self._append(ticker, meta, after, at=at)
+
+    def _rewrite(self, ticker, df):
+        meta = self.meta(ticker) or {"version": 0, "rows": 0}
+        if df is None or df.empty:
+            if meta["rows"]:
+                meta["checked"] = time.time(); self._write_meta(ticker, meta)
+            return meta if meta["rows"] else None
+        df = normalize_bars(df)
+        old_version = meta["version"]
+        retired = meta.get("retired", []) + [[old_version, time.time()]]
+        meta = {"version": old_version + 1, "rows": 0, "retired": retired}
+        os.makedirs(os.path.join(self._dir(ticker), f"v{meta['version']}"), exist_ok=True)
+        return self._append(ticker, meta, df, at=0)
+
+    def _prune(self, ticker):
+        # Delete version directories replaced more than VERSION_GRACE ago. Called with the ticker locked.
+        meta = self.meta(ticker)
+        if not meta or not meta.get("retired"): return
+        now, keep = time.time(), []
+        for version, retired_at in meta["retired"]:
+            if now - retired_at < VERSION_GRACE: keep.append([version, retired_at])
+            else: shutil.rmtree(os.path.join(self._dir(ticker), f"v{version}"), ignore_errors=True)
+        if len(keep) < len(meta["retired"]): self._write_meta(ticker, dict(meta, retired=keep))
+
+    def _append(self, ticker, meta, df, at):
+        # Write bars starting at row `at` (rows before it are kept), then publish the new row count.
+        data = {"Date": df.index.values.astype("datetime64[ns]").astype("<i8")}
+        for col in COLUMNS:
+            data[col] = df[col].to_numpy(dtype="<f8", na_value=np.nan) if col in df.columns else np.full(len(df), np.nan)
+        for col, arr in data.items():
+            path = self._col_path(ticker, meta, col)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.seek(at * 8)
+                f.write(arr.tobytes())
+        meta = dict(meta, rows=at + len(df), checked=time.time())
+        self._write_meta(ticker, meta)
+        return meta
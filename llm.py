@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+from cache import DiskCache, MISS
+from groq_client import chat
+from perf import recorder, span
+from prompt_budget import fit_context
+from singleflight import group
+
+PRIMARY_MODEL = "llama-3.3-70b-versatile"
+BACKUP_MODEL  = "llama-3.1-8b-instant"
+TEMPERATURE = 0.1
+MAX_TOKENS = 400
+BATCH_MAX_TOKENS = 900
+# Longest a call waits on the shared rate budget: the primary gives up quickly in favour of the backup.
+PRIMARY_MAX_WAIT = float(os.environ.get("VIP_PRIMARY_MAX_WAIT", "3"))
+BACKUP_MAX_WAIT = float(os.environ.get("VIP_BACKUP_MAX_WAIT", "30"))
+
+# Seconds from the start of an analysis after which topics still waiting on Groq show a fallback
+# score (see cached_topic_score and scoring.heuristic_topic_score) until the answer arrives; 0 waits.
+ANALYSIS_DEADLINE = float(os.environ.get("VIP_ANALYSIS_DEADLINE", "8"))
+
+# "batched": one JSON request for all topics; "per_topic": one SCORE|REASON request per topic.
+SCORING_MODES = ("batched", "per_topic")
+
+# --- LLM RESPONSE CACHE ---
+# Answers from the backup model expire sooner so the primary model gets another chance to answer.
+LLM_CACHE_TTL = int(os.environ.get("VIP_LLM_CACHE_TTL", str(24 * 3600)))
+LLM_BACKUP_TTL = int(os.environ.get("VIP_LLM_BACKUP_TTL", str(3600)))
+LLM_CACHE_MB = int(os.environ.get("VIP_LLM_CACHE_MB", "64"))
+
+llm_cache = DiskCache("llm_responses", LLM_CACHE_MB * 1024 * 1024)
+llm_flight = group("llm")
+
+def prompt_key(model, prompt, temperature, lang):
+    return hashlib.sha256(f"{model}\x00{temperature}\x00{lang}\x00{prompt}".encode("utf-8")).hexdigest()
+
+def language_instruction(lang):
+    if lang == 'CN':
+        return "You MUST Output the reason in Traditional Chinese (繁體中文)."
+    return "Answer in English."
+
+def build_prompt(ticker, summary, topic, lang='EN'):
+    # Long context is compacted to the prompt token budget (see prompt_budget.py).
+    lang_instruction = language_instruction(lang)
+    summary = fit_context(summary)[0]
+    if topic == "EarningsSummary":
+        return f"Summarize the recent financial performance and news for {ticker}. Context: {summary}. Keep it concise (3-4 bullet points). {lang_instruction}"
+    elif topic == "ValuationSummary":
+        return f"Analyze the valuation status of {ticker} based on this data: {summary}. Is it undervalued or overvalued relative to its history? Provide a 1-sentence insight. {lang_instruction}"
+    return (
+        f"Analyze {ticker} regarding '{topic}'. Context: {summary}. "
+        f"Give a specific score from 0.0 to 4.0 (use 1 decimal place). "
+        f"Provide a 1 sentence reason. {lang_instruction} "
+        f"Strict Format: SCORE|REASON"
+    )
+
+def complete(client, prompt, lang='EN', max_tokens=MAX_TOKENS, json_mode=False, validate=None, cache_only=False, stage="completion", on_text=None, saved_tokens=0):
+    # Cached chat completion with backup-model fallback. Returns (text, is_backup); with cache_only, a
+    # cache miss returns (None, False) instead of calling Groq. Answers failing `validate` are not cached.
+    # Each Groq call is timed as llm.<stage> (llm.<stage>.backup for the fallback) with token counts,
+    # including `saved_tokens`, the context tokens prompt compaction kept out of the request.
+    # With on_text, Groq calls are streamed and on_text(text_so_far) is called from the calling thread as
+    # tokens arrive; a fallback to the backup starts over from empty text. Cache hits do not call it.
+    primary_key = prompt_key(PRIMARY_MODEL, prompt, TEMPERATURE, lang)
+    backup_key = prompt_key(BACKUP_MODEL, prompt, TEMPERATURE, lang)
+
+    cached = llm_cache.get(primary_key, PRIMARY_MODEL)
+    if cached is not MISS: return cached, False
+    cached = llm_cache.get(backup_key, BACKUP_MODEL)
+    if cached is not MISS: return cached, True
+    if cache_only: return None, False
+
+    def call_groq(model_id):
+        extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+        is_primary = model_id == PRIMARY_MODEL
+        span_stage = f"llm.{stage}" if is_primary else f"llm.{stage}.backup"
+        with span(span_stage, model=model_id) as attrs:
+            t0, first = time.perf_counter(), []
+
+            def stream_cb(text):
+                if not first:
+                    first.append(True)
+                    recorder.record(f"{span_stage}.first_token", time.perf_counter() - t0, {"model": model_id})
+                on_text(text)
+            try:
+                resp = chat(
+                    client, model_id, prompt, max_tokens, PRIMARY_MAX_WAIT if is_primary else BACKUP_MAX_WAIT,
+                    use_breaker=is_primary, on_text=stream_cb if on_text is not None else None, temperature=TEMPERATURE, **extra
+                )
+            except Exception as e:
+                attrs["error"] = type(e).__name__
+                raise
+            # Savings count only for a request that was sent, so a skipped primary does not add them twice.
+            attrs["saved_tokens"] = saved_tokens
+            usage = getattr(resp, "usage", None)
+            attrs["prompt_tokens"] = getattr(usage, "prompt_tokens", None)
+            attrs["completion_tokens"] = getattr(usage, "completion_tokens", None)
+        return resp
+
+    # The primary is skipped without a request while its circuit is open or its budget is exhausted.
+    def ask():
+        try:
+            text = call_groq(PRIMARY_MODEL).choices[0].message.content
+            if validate is None or validate(text):
+                llm_cache.set(primary_key, text, LLM_CACHE_TTL, kind=PRIMARY_MODEL)
+            return text, False
+        except Exception:
+            try:
+                text = call_groq(BACKUP_MODEL).choices[0].message.content
+                if validate is None or validate(text):
+                    llm_cache.set(backup_key, text, LLM_BACKUP_TTL, kind=BACKUP_MODEL)
+                return text, True
+            except Exception as e:
+                return f"0.0|Error: {str(e)}", True
+
+    # Identical prompts in flight at the same time share one request; only the first caller streams.
+    return llm_flight.do(primary_key, ask)
+
+def analyze_qualitative(client, ticker, summary, topic, lang='EN', cache_only=False, on_text=None):
+    # `lang` is passed in rather than read from st.session_state so this can run in worker threads.
+    # on_text streams the answer (see complete); it is meant for the free-text summaries.
+    stage = topic if topic in ("EarningsSummary", "ValuationSummary") else "topic"
+    return complete(
+        client, build_prompt(ticker, summary, topic, lang), lang, cache_only=cache_only, stage=stage, on_text=on_text,
+        saved_tokens=fit_context(summary)[1],
+    )
+
+def parse_topic_score(res):
+    match = re.search(r'\b([0-3](?:\.\d)?|4(?:\.0)?)\b', res)
+    if match:
+        s_str = match.group(1); s = float(s_str)
+        r = res.replace(s_str, "").replace("|", "").replace("SCORE", "").replace("REASON", "").strip().strip(' :-=\n')
+        return s, r
+    return 0.0, res
+
+def score_topic(client, ticker, summary, topic, lang='EN', cache_only=False):
+    # (score, reason, is_backup), or None when cache_only misses.
+    res, is_backup = analyze_qualitative(client, ticker, summary, topic, lang, cache_only)
+    if res is None: return None
+    return parse_topic_score(res) + (is_backup,)
+
+# --- BATCHED TOPIC SCORING ---
+def build_batch_prompt(ticker, summary, topics, lang='EN'):
+    keys = ", ".join(f'"{t}"' for t in topics)
+    return (
+        f"Analyze {ticker} on each of these topics: {keys}. Context: {fit_context(summary)[0]}. "
+        f"For each topic give a specific score from 0.0 to 4.0 (use 1 decimal place) and a 1 sentence reason. "
+        f"{language_instruction(lang)} "
+        f'Respond with only a JSON object whose keys are exactly the topic names and whose values are '
+        f'{{"score": <number>, "reason": "<sentence>"}}.'
+    )
+
+def parse_batch_scores(text, topics):
+    # Schema check: {topic: {"score": number in [0, 4], "reason": non-empty string}}. Entries that do not
+    # match are left out so the caller can re-ask just those topics.
+    try: obj = json.loads(text)
+    except (TypeError, ValueError): return {}
+    if not isinstance(obj, dict): return {}
+    out = {}
+    for t in topics:
+        v = obj.get(t)
+        if not isinstance(v, dict): continue
+        score, reason = v.get("score"), v.get("reason")
+        if isinstance(score, str):
+            try: score = float(score)
+            except ValueError: continue
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 4: continue
+        if not isinstance(reason, str) or not reason.strip(): continue
+        out[t] = (round(float(score), 1), reason.strip())
+    return out
+
+def score_topics_batched(client, ticker, summary, topics, lang='EN', cache_only=False):
+    # One request for every topic; missing or malformed topics fall back to score_topic.
+    prompt = build_batch_prompt(ticker, summary, topics, lang)
+    text, is_backup = complete(
+        client, prompt, lang, max_tokens=BATCH_MAX_TOKENS, json_mode=True, cache_only=cache_only, stage="batch",
+        saved_tokens=fit_context(summary)[1],
+        validate=lambda t: len(parse_batch_scores(t, topics)) == len(topics),
+    )
+    parsed = parse_batch_scores(text, topics) if text is not None else {}
+    return [parsed[t] + (is_backup,) if t in parsed else score_topic(client, ticker, summary, t, lang, cache_only) for t in topics]
+
+def cached_topic_score(client, ticker, summary, topic, topics, lang='EN'):
+    # A cached answer for `topic` from either scoring mode, never calling Groq; None if there is none.
+    res = score_topic(client, ticker, summary, topic, lang, cache_only=True)
+    if res is not None: return res
+    text, is_backup = complete(client, build_batch_prompt(ticker, summary, topics, lang), lang, cache_only=True)
+    parsed = parse_batch_scores(text, topics) if text is not None else {}
+    return parsed[topic] + (is_backup,) if topic in parsed else None
+
+def topic_prompts(ticker, summary, topics, lang='EN', scoring_mode="batched"):
+    # The prompts score_topics sends first in `scoring_mode` (batched fallbacks re-ask with build_prompt).
+    if scoring_mode == "batched": return [build_batch_prompt(ticker, summary, topics, lang)]
+    return [build_prompt(ticker, summary, t, lang) for t in topics]
+
+def score_topics(client, ticker, summary, topics, lang='EN', scoring_mode="batched", cache_only=False):
+    # [(score, reason, is_backup) or None per topic] in either scoring mode, sequentially.
+    if scoring_mode == "batched": return score_topics_batched(client, ticker, summary, topics, lang, cache_only)
+    return [score_topic(client, ticker, summary, t, lang, cache_only) for t in topics]
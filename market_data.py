@@ -0,0 +1,165 @@
+import asyncio
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache import DiskCache, MISS
+from fundamentals import FundamentalsStore
+from perf import span
+from history_store import HistoryStore
+from pe_history import MIN_TTM_COVERAGE, build_pe_index, latest_ttm_eps, quarterly_eps
+from providers import DATA_PROVIDER, get_provider, run, submit
+from scoring import price_eps_pe
+from singleflight import group
+from snapshot import INFO_FIELDS, MarketSnapshot, snapshots
+from technicals import WINDOW
+
+# --- MARKET DATA CACHE ---
+# Seconds each kind of yfinance data stays fresh. Prices move by the minute, statements by the quarter.
+CACHE_TTL = {
+    "info": 15 * 60,
+    "history": 5 * 60,
+    "dividends": 24 * 3600,
+    "earnings_dates": 6 * 3600,
+    "quarterly_income_stmt": 3 * 24 * 3600,
+    "news": 15 * 60,
+    "pe_index": 24 * 3600,
+}
+MARKET_CACHE_MB = int(os.environ.get("VIP_MARKET_CACHE_MB", "256"))
+
+# Module-level so it is shared by every session (Streamlit re-runs app.py, not imported modules).
+market_cache = DiskCache("market_data", MARKET_CACHE_MB * 1024 * 1024)
+history_store = HistoryStore()
+fundamentals = FundamentalsStore()
+provider = get_provider(DATA_PROVIDER)
+# Concurrent misses for the same key (ticker:kind, or a ticker's core load) share one fetch.
+fetch_flight = group("market_data")
+core_flight = group("load_core")
+
+def cached_fetch(ticker, kind, fetch):
+    key = f"{ticker}:{kind}"
+    val = market_cache.get(key, kind)
+    if val is not MISS: return val
+
+    def fetch_and_store():
+        with span(f"yf.{kind}", ticker=ticker): val = fetch()
+        if val is not None: market_cache.set(key, val, CACHE_TTL[kind], kind=kind)
+        return val
+    return fetch_flight.do(key, fetch_and_store)
+
+def fetch_kind(ticker, kind):
+    return cached_fetch(ticker, kind, lambda: run(provider.fetch(ticker, kind)))
+
+async def fetch_many(pairs):
+    # Cached values for [(ticker, kind)], fetching the misses concurrently; a failed fetch is None.
+    # Misses go through fetch_flight like cached_fetch, so they join identical fetches in flight.
+    async def one(ticker, kind):
+        key = f"{ticker}:{kind}"
+        val = market_cache.get(key, kind)
+        if val is not MISS: return val
+
+        async def fetch_and_store():
+            with span(f"yf.{kind}", ticker=ticker): val = await provider.fetch(ticker, kind)
+            if val is not None: market_cache.set(key, val, CACHE_TTL[kind], kind=kind)
+            return val
+        try: return await fetch_flight.do_async(key, fetch_and_store)
+        except Exception: return None
+    return await asyncio.gather(*(one(t, k) for t, k in pairs))
+
+def history_fetcher(ticker):
+    # Initial load pulls INITIAL_PERIOD; later refreshes only ask for bars from the store's anchor date on.
+    def fetch(start):
+        with span("yf.history", ticker=ticker, mode="full" if start is None else "incremental"):
+            return run(provider.history(ticker, start))
+    return fetch
+
+def statement_eps(ticker):
+    # Quarterly EPS for the PE history from cached statements only, so bulk callers (the screener)
+    # never trigger per-ticker statement downloads; build_core fetches them.
+    def get(kind):
+        val = market_cache.get(f"{ticker}:{kind}", kind)
+        return None if val is MISS else val
+    return quarterly_eps(get("quarterly_income_stmt"), get("earnings_dates"))
+
+def pe_index(ticker, q_eps, eps):
+    # Stored per ticker over the last five years of completed bars (the live last bar is left out so
+    # intraday refreshes do not invalidate it); rebuilt when a bar is completed or the inputs change.
+    cols = history_store.columns(ticker)
+    if cols is None or len(cols["Date"]) < 2: return build_pe_index(np.empty(0, "i8"), np.empty(0), q_eps, eps)
+    meta = history_store.meta(ticker)
+    fingerprint = (meta["version"], int(cols["Date"][-2]), tuple(q_eps.items()), eps, MIN_TTM_COVERAGE)
+    key = f"{ticker}:pe_index"
+    idx = market_cache.get(key, "pe_index")
+    if idx is not MISS and idx.fingerprint == fingerprint: return idx
+
+    since = (pd.Timestamp.now().normalize() - pd.DateOffset(years=5)).value
+    start = np.searchsorted(cols["Date"], since, side="left")
+    with span("pe_index.build", ticker=ticker):
+        idx = build_pe_index(np.array(cols["Date"][start:-1]), np.array(cols["Close"][start:-1]), q_eps, eps, fingerprint)
+    market_cache.set(key, idx, CACHE_TTL["pe_index"], kind="pe_index")
+    return idx
+
+def placed_pe(price, eps, pe, idx, q_eps):
+    # The (eps, pe) to place in idx's range: the trailing PE on the latest TTM EPS for a TTM range,
+    # the current (forward) EPS and PE for a current-EPS range.
+    if idx.basis != "ttm": return eps, pe
+    eps = latest_ttm_eps(q_eps)
+    if np.isnan(eps): return None, 0
+    return eps, price / eps if eps > 0 else 0
+
+# --- SEPARATELY LOADABLE RESOURCES ---
+# The Value and Technical tabs only need load_core; the Financials and News & Earnings tabs can load in parallel.
+def load_core(ticker):
+    return core_flight.do(ticker, lambda: build_core(ticker))
+
+def build_core(ticker):
+    try:
+        info = fetch_kind(ticker, "info")
+        if not info: return None
+
+        # Statements (for the TTM EPS behind the PE history) download while the price history refreshes.
+        statements = submit(fetch_many([(ticker, "quarterly_income_stmt"), (ticker, "earnings_dates")]))
+        history_store.refresh(ticker, history_fetcher(ticker), CACHE_TTL["history"])
+        q_eps = quarterly_eps(*statements.result())
+
+        # Unchanged bars, info and statements return the snapshot other sessions already hold.
+        cols = history_store.columns(ticker)
+        bars_fp = (history_store.meta(ticker)["version"], len(cols["Date"]), int(cols["Date"][-1]), float(cols["Close"][-1])) if cols else None
+        info_fp = tuple(info.get(k) for k in INFO_FIELDS + ("currency", "longName", "industry", "longBusinessSummary"))
+        fingerprint = (bars_fp, info_fp, tuple(q_eps.items()))
+        snap = snapshots.get(ticker, fingerprint)
+        if snap is not None: return snap
+
+        # A new snapshot means new info (or bars), so it is also today's row in the fundamentals store.
+        try: fundamentals.record(ticker, info)
+        except Exception: pass
+        hist = history_store.frame(ticker, tail=WINDOW)
+        price, eps, pe = price_eps_pe(info, hist)
+        idx = pe_index(ticker, q_eps, eps)
+        eps, pe = placed_pe(price, eps, pe, idx, q_eps)
+        return snapshots.put(ticker, MarketSnapshot({
+            "ticker": ticker, "price": price, "currency": info.get('currency', 'USD'), "pe": pe,
+            "eps": eps, "min_pe": idx.min, "max_pe": idx.max, "pe_pct": idx.percentile(pe), "pe_basis": idx.basis, "pe_years": idx.years,
+            "name": info.get('longName', ticker), "industry": info.get('industry', 'Unknown'),
+            "summary": info.get('longBusinessSummary', 'No summary available.'),
+            "raw_info": info,
+        }, hist, fingerprint))
+    except: return None
+
+def load_financials(ticker):
+    # "fundamentals" is the ticker's latest row in the fundamentals store (None if load_core never built it).
+    try: divs = fetch_kind(ticker, "dividends")
+    except: divs = None
+    return {"dividends": divs, "fundamentals": fundamentals.latest(ticker)}
+
+def load_news(ticker):
+    earnings_dates, quarterly_financials, raw_news = run(fetch_many([(ticker, "earnings_dates"), (ticker, "quarterly_income_stmt"), (ticker, "news")]))
+    try: news = [n for n in raw_news if n.get('title')]
+    except: news = []
+    return {"earnings_dates": earnings_dates, "quarterly_financials": quarterly_financials, "news": news}
+
+def get_stock_data(ticker):
+    data = load_core(ticker)
+    if not data: return None
+    return {**data, **load_financials(ticker), **load_news(ticker)}
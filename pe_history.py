@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+# --- HISTORICAL PE ---
+# The PE on each trading day is the close divided by the trailing-twelve-month EPS known on that day.
+# Quarterly EPS comes from one of two sources, never mixed in one TTM sum: the income statement's GAAP
+# EPS, dated REPORT_LAG after the quarter ends (roughly when it becomes public, so no day sees a number
+# from its future), or earnings_dates' reported EPS (usually adjusted), dated at the announcement.
+# yfinance has about 5 statement quarters and 12 announcements, so the source with more quarters is used.
+# The range covers only the days with a TTM EPS, and the PE placed in it is the trailing PE (price over
+# the latest TTM EPS), so both sides use the same EPS. A TTM series covering less than MIN_TTM_COVERAGE
+# of the window is too short to be a historical range (the current PE would sit at one of its ends), so
+# the range then uses the current (forward) EPS throughout; the two bases are never spliced into one range.
+EPS_ROWS = ("Diluted EPS", "Basic EPS")
+REPORT_LAG = pd.Timedelta(days=45)
+MAX_TTM_SPAN = pd.Timedelta(days=400)  # four points spread wider than this are not four consecutive quarters
+PE_BOUNDS = (0, 200)
+MIN_TTM_COVERAGE = 0.6  # share of the window's price days with a TTM PE needed for the "ttm" basis
+NS_PER_YEAR = 365.25 * 86400e9
+
+def naive_day(ts):
+    ts = pd.Timestamp(ts)
+    return (ts.tz_localize(None) if ts.tzinfo is not None else ts).normalize()
+
+def quarterly_eps(quarterly_income_stmt=None, earnings_dates=None):
+    # Series of single-quarter EPS indexed by the day it became public, ascending, from one source.
+    statement, reported = {}, {}
+    stmt = quarterly_income_stmt
+    if stmt is not None and not stmt.empty:
+        row = next((stmt.loc[r] for r in EPS_ROWS if r in stmt.index), None)
+        if row is not None:
+            for period, v in row.items():
+                if pd.notna(v): statement[naive_day(period) + REPORT_LAG] = float(v)
+    if earnings_dates is not None and not earnings_dates.empty and "Reported EPS" in earnings_dates.columns:
+        for d, v in earnings_dates["Reported EPS"].dropna().items(): reported[naive_day(d)] = float(v)
+    return pd.Series(reported if len(reported) > len(statement) else statement, dtype=float).sort_index()
+
+def ttm_eps(q_eps):
+    # Rolling four-quarter sum; NaN where the four quarters are not consecutive.
+    if len(q_eps) < 4: return pd.Series(dtype=float)
+    ttm = q_eps.rolling(4).sum()
+    ttm[q_eps.index.to_series().diff(3) > MAX_TTM_SPAN] = np.nan
+    return ttm.dropna()
+
+def latest_ttm_eps(q_eps, when=None):
+    # TTM EPS in effect at `when` (default now), NaN without one.
+    ts = naive_day(when if when is not None else pd.Timestamp.now())
+    return float(asof(np.array([ts.value]), ttm_eps(q_eps))[0])
+
+def asof(dates, points):
+    # Value of `points` in effect on each date (int64 ns): the last point at or before it, NaN before the first.
+    if points.empty: return np.full(len(dates), np.nan)
+    keys = points.index.values.astype("datetime64[ns]").view("i8")
+    pos = np.searchsorted(keys, dates, side="right") - 1
+    return np.where(pos >= 0, points.to_numpy()[np.maximum(pos, 0)], np.nan)
+
+def pe_series(dates, close, ttm):
+    eps = asof(dates, ttm)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(eps > 0, np.asarray(close, dtype=float) / eps, np.nan)
+
+class PEIndex:
+    # Sorted in-bounds historical PEs. min/max are the ends of the array and the percentile of a PE is
+    # one binary search, so lookups never rescan the history. `basis` is "ttm" or "current_eps";
+    # `years` is the span from the first to the last day with a PE.
+    def __init__(self, values, basis, fingerprint=None, years=0.0):
+        values = np.asarray(values, dtype=float)
+        values = values[(values > PE_BOUNDS[0]) & (values < PE_BOUNDS[1])]
+        self.sorted = np.sort(values)
+        self.basis = basis
+        self.fingerprint = fingerprint
+        self.years = years
+
+    def __len__(self):
+        return len(self.sorted)
+
+    @property
+    def min(self):
+        return float(self.sorted[0]) if len(self.sorted) else 0
+
+    @property
+    def max(self):
+        return float(self.sorted[-1]) if len(self.sorted) else 0
+
+    def percentile(self, pe):
+        # Share of historical days with a PE at or below `pe`, in [0, 1]; None without history or a PE.
+        if not len(self.sorted) or not pe or pe <= 0: return None
+        return np.searchsorted(self.sorted, pe, side="right") / len(self.sorted)
+
+def in_bounds(pe):
+    return (pe > PE_BOUNDS[0]) & (pe < PE_BOUNDS[1])
+
+def build_pe_index(dates, close, q_eps, eps, fingerprint=None):
+    # TTM PEs on the days TTM EPS covers when that is most of the window, else the current EPS over the
+    # whole window.
+    dates, close = np.asarray(dates), np.asarray(close, dtype=float)
+    pe = pe_series(dates, close, ttm_eps(q_eps))
+    if len(dates) and np.count_nonzero(in_bounds(pe)) >= MIN_TTM_COVERAGE * len(dates): basis = "ttm"
+    else:
+        basis = "current_eps"
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pe = close / eps if eps and eps > 0 else np.full(len(close), np.nan)
+    days = np.flatnonzero(in_bounds(pe))
+    years = (int(dates[days[-1]]) - int(dates[days[0]])) / NS_PER_YEAR if len(days) else 0.0
+    return PEIndex(pe, basis, fingerprint, years)
@@ -0,0 +1,144 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import singleflight
+
+# --- STAGE TIMING ---
+# Process-wide, so percentiles aggregate over every session served by this Streamlit server.
+PERF_LOG = os.environ.get("VIP_PERF_LOG")  # JSON lines file, one record per span; off when unset
+METRICS_PORT = os.environ.get("VIP_METRICS_PORT")  # serves OpenMetrics text at /metrics when set
+SAMPLES_PER_STAGE = 1000
+TOKEN_KINDS = ("prompt_tokens", "completion_tokens", "saved_tokens")
+
+_local = threading.local()
+
+class Tally:
+    # Token counts of the spans recorded on worker threads bound to it, so a caller can total what its
+    # own Groq requests used: cache hits and calls coalesced onto another caller's request record no span.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = dict.fromkeys(TOKEN_KINDS, 0)
+
+    def bind(self):
+        # Pass as a ThreadPoolExecutor initializer.
+        _local.tally = self
+
+    def add(self, attrs):
+        with self._lock:
+            for k in TOKEN_KINDS: self.totals[k] += attrs.get(k) or 0
+
+    def __getitem__(self, kind):
+        with self._lock: return self.totals[kind]
+
+class PerfRecorder:
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._totals = {}
+
+    @contextlib.contextmanager
+    def span(self, stage, **attrs):
+        # Yields the attrs dict so the body can add details (model, token counts) before it is recorded.
+        t0 = time.perf_counter()
+        try: yield attrs
+        finally: self.record(stage, time.perf_counter() - t0, attrs)
+
+    def record(self, stage, seconds, attrs=None):
+        attrs = attrs or {}
+        tally = getattr(_local, "tally", None)
+        if tally is not None: tally.add(attrs)
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=SAMPLES_PER_STAGE)).append(seconds)
+            tot = self._totals.setdefault(stage, {"count": 0, "sum": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "saved_tokens": 0})
+            tot["count"] += 1
+            tot["sum"] += seconds
+            tot["prompt_tokens"] += attrs.get("prompt_tokens") or 0
+            tot["completion_tokens"] += attrs.get("completion_tokens") or 0
+            tot["saved_tokens"] += attrs.get("saved_tokens") or 0
+            if self.log_path:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps({"ts": time.time(), "stage": stage, "seconds": round(seconds, 6), **attrs}, default=str) + "\n")
+
+    def summary(self):
+        with self._lock:
+            rows = []
+            for stage, samples in sorted(self._samples.items()):
+                arr = np.fromiter(samples, dtype=float)
+                tot = self._totals[stage]
+                rows.append({
+                    "stage": stage, "count": tot["count"],
+                    "p50_ms": float(np.percentile(arr, 50)) * 1000, "p95_ms": float(np.percentile(arr, 95)) * 1000,
+                    "prompt_tokens": tot["prompt_tokens"], "completion_tokens": tot["completion_tokens"],
+                    "saved_tokens": tot["saved_tokens"],
+                })
+        return rows
+
+    def openmetrics(self):
+        lines = ["# TYPE vip_stage_duration_seconds summary", "# UNIT vip_stage_duration_seconds seconds"]
+        with self._lock:
+            items = [(stage, np.fromiter(samples, dtype=float), dict(self._totals[stage])) for stage, samples in sorted(self._samples.items())]
+        for stage, arr, tot in items:
+            for q in (0.5, 0.95):
+                lines.append(f'vip_stage_duration_seconds{{stage="{stage}",quantile="{q}"}} {np.quantile(arr, q):.6f}')
+            lines.append(f'vip_stage_duration_seconds_count{{stage="{stage}"}} {tot["count"]}')
+            lines.append(f'vip_stage_duration_seconds_sum{{stage="{stage}"}} {tot["sum"]:.6f}')
+        lines.append("# TYPE vip_llm_tokens counter")
+        for stage, _, tot in items:
+            if tot["prompt_tokens"] or tot["completion_tokens"]:
+                lines.append(f'vip_llm_tokens_total{{stage="{stage}",kind="prompt"}} {tot["prompt_tokens"]}')
+                lines.append(f'vip_llm_tokens_total{{stage="{stage}",kind="completion"}} {tot["completion_tokens"]}')
+            if tot["saved_tokens"]:
+                lines.append(f'vip_llm_tokens_total{{stage="{stage}",kind="saved"}} {tot["saved_tokens"]}')
+        lines.append("# TYPE vip_coalesced_calls counter")
+        for name, g in sorted(singleflight.stats().items()):
+            lines.append(f'vip_coalesced_calls_total{{group="{name}"}} {g["deduped"]}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+recorder = PerfRecorder(PERF_LOG)
+
+def span(stage, **attrs):
+    return recorder.span(stage, **attrs)
+
+# --- OPENMETRICS ENDPOINT ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404); return
+        body = recorder.openmetrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): pass
+
+_server = None
+_server_tried = False
+_server_lock = threading.Lock()
+
+def start_metrics_server(port=METRICS_PORT):
+    # Started by the app entry point, at most once per process (Streamlit re-runs app.py on every
+    # interaction). Workers and the warmer import this module without serving, so an inherited
+    # VIP_METRICS_PORT cannot make them collide; a port in use is reported instead of raised.
+    global _server, _server_tried
+    if not port: return None
+    with _server_lock:
+        if not _server_tried:
+            _server_tried = True
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+                threading.Thread(target=_server.serve_forever, daemon=True, name="vip-metrics").start()
+            except OSError as e:
+                print(f"perf: metrics server not started on port {port}: {e}", file=sys.stderr)
+        return _server
@@ -0,0 +1,131 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import groq_client
+from analysis import earnings_context, valuation_context
+from groq_client import get_client
+from llm import SCORING_MODES, analyze_qualitative, score_topics
+from market_data import load_core, load_news
+from score_history import input_fingerprints, score_history
+from scoring import QUAL_TOPICS, qual_total, valuation_multiplier, grade_key, technical_action
+
+# --- HEADLESS ANALYSIS PIPELINE ---
+# The single-stock analysis without Streamlit: fetch, technicals, valuation multiplier, topic scores and
+# grade, as a flat record per ticker. Importable (analyze_ticker / analyze_many) or from the shell:
+#   python -m pipeline NVDA AAPL 0700.HK --format csv --workers 8 > scores.csv
+# Tickers must already be normalized (RY.TO, 0700.HK); see scoring.normalize_ticker.
+
+def analyze_ticker(client, ticker, lang='EN', scoring_mode="batched", use_ai=True, summaries=False):
+    # Without use_ai only cached LLM answers are used; a ticker missing any topic gets no final score.
+    # Components whose inputs are unchanged since the ticker's last stored row are taken from the score
+    # history instead of recomputed (see score_history.py); the result is stored as today's row.
+    data = load_core(ticker)
+    if not data: return {"ticker": ticker, "error": "not found"}
+    fps = input_fingerprints(data, QUAL_TOPICS, lang, scoring_mode)
+    prev = score_history.latest(ticker, lang)
+    reuse = score_history.reusable(prev, fps)
+
+    if "valuation" in reuse: mult, pos_pct = prev['mult'], prev['pe_pos']
+    else: mult, pos_pct = valuation_multiplier(data['pe'], data['min_pe'], data['max_pe'])
+    if "technical" in reuse:
+        action_key, reason_key, trend, rsi = prev['action'], prev['action_reason'], prev['trend'], prev['rsi']
+    else:
+        tech = data.technicals()
+        action_key, reason_key = technical_action(tech) if tech else (None, None)
+        trend, rsi = (tech['trend'], tech['rsi']) if tech else (None, None)
+    if "topics" in reuse: scored = [(s, r, False) for s, r in prev['topics']]
+    else: scored = score_topics(client, data['name'], data['summary'], QUAL_TOPICS, lang, scoring_mode, cache_only=not use_ai)
+    total_qual = None if None in scored else qual_total(t[0] for t in scored)
+    final_score = round(total_qual * mult, 1) if total_qual is not None else None
+    grade = grade_key(final_score) if final_score is not None else None
+    score_history.record(
+        ticker, lang, fps, topics=[t[:2] if t else None for t in scored], topics_backup=any(t and t[2] for t in scored),
+        total_qual=total_qual, mult=mult, pe_pos=pos_pct, final_score=final_score, grade=grade,
+        action=action_key, action_reason=reason_key, trend=trend, rsi=rsi,
+    )
+
+    record = {
+        "ticker": ticker, "name": data['name'], "currency": data['currency'], "price": data['price'],
+        "pe": data['pe'] if data['pe'] and data['pe'] > 0 else None, "min_pe": data['min_pe'], "max_pe": data['max_pe'],
+        "pe_pos": pos_pct * 100, "pe_pct": data['pe_pct'] * 100 if data['pe_pct'] is not None else None,
+        "pe_basis": data['pe_basis'], "pe_years": data['pe_years'], "mult": mult,
+        "trend": trend, "rsi": rsi, "action": action_key, "action_reason": reason_key,
+        "qual": total_qual, "final_score": final_score, "grade": grade,
+        "topics": {t: {"score": r[0], "reason": r[1]} if r else None for t, r in zip(QUAL_TOPICS, scored)},
+    }
+    if summaries:
+        record["valuation_summary"] = analyze_qualitative(client, data['name'], valuation_context(data), "ValuationSummary", lang, cache_only=not use_ai)[0]
+        news_context = earnings_context(load_news(ticker))['prompt_context']
+        record["earnings_summary"] = analyze_qualitative(client, data['name'], news_context, "EarningsSummary", lang, cache_only=not use_ai)[0]
+    return record
+
+# --- MULTIPROCESSING ---
+# Each worker process has its own Groq client and rate budget, so the per-minute limits are split
+# evenly between them. The disk caches are shared. Workers are spawned rather than forked so no SQLite
+# connection or lock is inherited mid-use.
+_worker = {}
+
+def _init_worker(api_key, workers, options):
+    groq_client.GROQ_RPM = max(1, groq_client.GROQ_RPM // workers) if groq_client.GROQ_RPM else 0
+    groq_client.GROQ_TPM = max(1, groq_client.GROQ_TPM // workers) if groq_client.GROQ_TPM else 0
+    _worker["client"] = get_client(api_key) if api_key else None
+    _worker["options"] = options
+
+def _analyze_in_worker(ticker):
+    try: return analyze_ticker(_worker["client"], ticker, **_worker["options"])
+    except Exception as e: return {"ticker": ticker, "error": str(e)}
+
+def analyze_many(tickers, api_key=None, workers=1, **options):
+    # Records in input order. options are passed to analyze_ticker.
+    if workers <= 1:
+        _init_worker(api_key, 1, options)
+        return [_analyze_in_worker(t) for t in tickers]
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker, initargs=(api_key, workers, options),
+    ) as pool:
+        return list(pool.map(_analyze_in_worker, tickers))
+
+def to_frame(records):
+    # One row per ticker; topics flatten to a score column each (reasons stay in the JSON output).
+    rows = []
+    for r in records:
+        row = {k: v for k, v in r.items() if k != "topics"}
+        for t, res in (r.get("topics") or {}).items(): row[t] = res["score"] if res else None
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score tickers without the Streamlit UI.")
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default 1: run in this process)")
+    parser.add_argument("--lang", choices=("EN", "CN"), default="EN")
+    parser.add_argument("--scoring-mode", choices=SCORING_MODES, default="batched")
+    parser.add_argument("--no-ai", action="store_true", help="only use cached AI answers; never call Groq")
+    parser.add_argument("--summaries", action="store_true", help="also produce the valuation and earnings summaries")
+    parser.add_argument("--out", help="write here instead of stdout")
+    args = parser.parse_args(argv)
+
+    api_key = os.environ.get("GROQ_API_KEY")
+    if not api_key and not args.no_ai: parser.error("GROQ_API_KEY is not set (or pass --no-ai)")
+    records = analyze_many(
+        [t.upper() for t in args.tickers], api_key, args.workers,
+        lang=args.lang, scoring_mode=args.scoring_mode, use_ai=not args.no_ai, summaries=args.summaries,
+    )
+    out = open(args.out, "w", newline="") if args.out else sys.stdout
+    try:
+        if args.format == "csv": to_frame(records).to_csv(out, index=False)
+        else: json.dump(records, out, indent=2, default=float, ensure_ascii=False); out.write("\n")
+    finally:
+        if args.out: out.close()
+    return 1 if all("error" in r for r in records) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
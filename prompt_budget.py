@@ -0,0 +1,61 @@
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+from groq_client import estimate_tokens
+
+# --- PROMPT TOKEN BUDGET ---
+# Every prompt (template plus context) must fit PROMPT_TOKEN_BUDGET input tokens, counted the same way
+# as the rate limiter counts them. Context over its share is cut down extractively: the highest-scoring
+# sentences are kept, in their original order. The result depends only on the text, so a ticker's
+# summary is compacted once and every topic prompt (and every caller) gets the same bytes, which keeps
+# the LLM cache keys stable. 0 disables compaction.
+PROMPT_TOKEN_BUDGET = int(os.environ.get("VIP_PROMPT_TOKEN_BUDGET", "512"))
+TEMPLATE_RESERVE = 160  # the longest template (the batched topic prompt) is about 125 tokens
+
+SENTENCE_RE = re.compile(r"(?<=[.!?。！？])\s+|\n+")
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9'&-]*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in inc is it its of on or our that the their this to was "
+    "were which with also company companies well other such including through into".split()
+)
+
+def context_budget():
+    return PROMPT_TOKEN_BUDGET - TEMPLATE_RESERVE if PROMPT_TOKEN_BUDGET else None
+
+def truncate_words(text, budget):
+    # Longest word-boundary prefix within budget (estimate_tokens is chars / 4).
+    cut = text[:max(0, (budget - 1) * 4)]
+    return cut if len(cut) == len(text) else cut.rsplit(" ", 1)[0]
+
+@lru_cache(maxsize=512)
+def compact(text, budget):
+    # (text that fits `budget` tokens, tokens saved). Sentences score by how many of the text's frequent
+    # content words they contain, per word. The lead is always kept: the first sentence of prose (who the
+    # company is), or the first line and any "Heading:" lines of a list (the earnings figures).
+    if budget is None or estimate_tokens(text) <= budget: return text, 0
+    lines = [l.strip() for l in text.split("\n") if l.strip()]
+    is_list = len(lines) > 2
+    if is_list:
+        sentences = lines
+        lead = {0} | {i for i, l in enumerate(lines) if l.endswith(":")}
+    else:
+        sentences = [s.strip() for s in SENTENCE_RE.split(text) if s.strip()]
+        lead = {0}
+    words = [[w for w in WORD_RE.findall(s.lower()) if w not in STOPWORDS] for s in sentences]
+    freq = Counter(w for ws in words for w in set(ws))
+    scores = [float("inf") if i in lead else sum(freq[w] for w in set(ws)) / (len(ws) + 1) ** 0.5 for i, ws in enumerate(words)]
+
+    keep, used = set(), 0
+    for i in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost <= budget:
+            keep.add(i)
+            used += cost
+    out = ("\n" if is_list else " ").join(s for i, s in enumerate(sentences) if i in keep)
+    if not keep or estimate_tokens(out) > budget: out = truncate_words(out or sentences[0], budget)
+    return out, estimate_tokens(text) - estimate_tokens(out)
+
+def fit_context(text):
+    return compact(text, context_budget())
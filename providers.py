@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import yfinance as yf
+
+from history_store import INITIAL_PERIOD
+
+# --- MARKET DATA PROVIDERS ---
+# Where market data comes from, behind one async interface so several fetches (one ticker's statements
+# and news, or many tickers' histories) overlap their I/O. Picked with VIP_DATA_PROVIDER:
+#   yfinance       live data (default)
+#   local:<dir>    files in <dir>/<TICKER>/: info.json, history, dividends, earnings_dates and
+#                  quarterly_income_stmt as .parquet or .csv, news.json (benchmarks/record.py writes these)
+# Synchronous code calls run(coro), or submit(coro) for a Future, on one shared event loop thread.
+DATA_PROVIDER = os.environ.get("VIP_DATA_PROVIDER", "yfinance")
+PROVIDER_CONCURRENCY = int(os.environ.get("VIP_PROVIDER_CONCURRENCY", "8"))  # yfinance calls in flight
+PROVIDER_RETRIES = int(os.environ.get("VIP_PROVIDER_RETRIES", "2"))
+PROVIDER_BACKOFF_BASE = 0.5
+KINDS = ("info", "history", "dividends", "earnings_dates", "quarterly_income_stmt", "news")
+UTC_OFFSET_RE = r"(?:Z|[+-]\d{2}:?\d{2})$"
+
+def wall_clock(index):
+    # Each timestamp's exchange-local date and time with its UTC offset dropped. Parsing with utc=True
+    # would move bars stamped at local midnight east of UTC (HKEX, +08:00) onto the previous day.
+    return pd.to_datetime(pd.Index(index).astype(str).str.replace(UTC_OFFSET_RE, "", regex=True))
+
+class Provider(ABC):
+    @abstractmethod
+    async def info(self, ticker): ...
+    @abstractmethod
+    async def history(self, ticker, start=None): ...  # start=None: INITIAL_PERIOD
+    @abstractmethod
+    async def dividends(self, ticker): ...
+    @abstractmethod
+    async def earnings_dates(self, ticker): ...
+    @abstractmethod
+    async def quarterly_income_stmt(self, ticker): ...
+    @abstractmethod
+    async def news(self, ticker): ...
+
+    async def fetch(self, ticker, kind):
+        if kind not in KINDS: raise ValueError(f"unknown kind: {kind}")
+        return await getattr(self, kind)(ticker)
+
+    async def history_many(self, tickers, start=None):
+        # {ticker: frame} for the tickers that returned bars.
+        frames = await asyncio.gather(*(self.history(t, start) for t in tickers), return_exceptions=True)
+        return {t: df for t, df in zip(tickers, frames) if isinstance(df, pd.DataFrame) and not df.empty}
+
+class YFinanceProvider(Provider):
+    # yfinance is synchronous, so each call runs on the provider's own `concurrency` worker threads
+    # (the loop's default executor may be smaller), retried with full-jitter backoff.
+    def __init__(self, concurrency=PROVIDER_CONCURRENCY, retries=PROVIDER_RETRIES):
+        self.concurrency, self.retries = concurrency, retries
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="vip-yf")
+        self._sems = weakref.WeakKeyDictionary()  # one semaphore per event loop
+
+    async def _call(self, fn):
+        sem = self._sems.setdefault(asyncio.get_running_loop(), asyncio.Semaphore(self.concurrency))
+        async with sem:
+            for attempt in range(self.retries + 1):
+                try: return await asyncio.get_running_loop().run_in_executor(self._pool, fn)
+                except Exception:
+                    if attempt == self.retries: raise
+                    await asyncio.sleep(random.uniform(0, PROVIDER_BACKOFF_BASE * 2 ** attempt))
+
+    async def info(self, ticker):
+        return await self._call(lambda: yf.Ticker(ticker).info or None)
+
+    async def history(self, ticker, start=None):
+        def fetch():
+            stock = yf.Ticker(ticker)
+            if start is None: return stock.history(period=INITIAL_PERIOD)
+            return stock.history(start=start.strftime('%Y-%m-%d'))
+        return await self._call(fetch)
+
+    async def dividends(self, ticker): return await self._call(lambda: yf.Ticker(ticker).dividends)
+    async def earnings_dates(self, ticker): return await self._call(lambda: yf.Ticker(ticker).earnings_dates)
+    async def quarterly_income_stmt(self, ticker): return await self._call(lambda: yf.Ticker(ticker).quarterly_income_stmt)
+    async def news(self, ticker): return await self._call(lambda: yf.Ticker(ticker).news)
+
+    async def history_many(self, tickers, start=None):
+        # One yf.download for the whole list instead of a request per ticker.
+        tickers = list(tickers)
+        kwargs = {"period": INITIAL_PERIOD} if start is None else {"start": start.strftime('%Y-%m-%d')}
+        raw = await self._call(lambda: yf.download(tickers, group_by="ticker", auto_adjust=True, actions=True, threads=True, progress=False, **kwargs))
+        if raw is None or raw.empty: return {}
+        frames = {}
+        for sym in tickers:
+            try: df = raw[sym] if isinstance(raw.columns, pd.MultiIndex) else raw
+            except KeyError: continue
+            df = df.dropna(how="all")
+            if not df.empty: frames[sym] = df
+        return frames
+
+class LocalFileProvider(Provider):
+    # Read-only; a missing file is missing data (None, or no news), never a network call.
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, ticker, name, exts):
+        for ext in exts:
+            path = os.path.join(self.root, ticker, name + ext)
+            if os.path.exists(path): return path
+        return None
+
+    def _frame(self, ticker, name, dated_columns=False):
+        path = self._path(ticker, name, (".parquet", ".csv"))
+        if path is None: return None
+        if path.endswith(".parquet"): df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path, index_col=0)
+            if not dated_columns: df.index = wall_clock(df.index)
+        if dated_columns: df.columns = pd.to_datetime(df.columns)
+        return df
+
+    def _json(self, ticker, name):
+        path = self._path(ticker, name, (".json",))
+        if path is None: return None
+        with open(path) as f: return json.load(f)
+
+    async def info(self, ticker):
+        return await asyncio.to_thread(self._json, ticker, "info") or None
+
+    async def history(self, ticker, start=None):
+        df = await asyncio.to_thread(self._frame, ticker, "history")
+        if df is None or start is None: return df
+        return df[df.index.tz_localize(None).normalize() >= pd.Timestamp(start)]
+
+    async def dividends(self, ticker):
+        df = await asyncio.to_thread(self._frame, ticker, "dividends")
+        return df.iloc[:, 0] if df is not None else None
+
+    async def earnings_dates(self, ticker): return await asyncio.to_thread(self._frame, ticker, "earnings_dates")
+    async def quarterly_income_stmt(self, ticker): return await asyncio.to_thread(self._frame, ticker, "quarterly_income_stmt", True)
+    async def news(self, ticker): return await asyncio.to_thread(self._json, ticker, "news") or []
+
+def get_provider(spec=DATA_PROVIDER):
+    if spec == "yfinance": return YFinanceProvider()
+    if spec.startswith("local:"): return LocalFileProvider(spec[len("local:"):])
+    raise ValueError(f"unknown VIP_DATA_PROVIDER: {spec}")
+
+async def export(provider, ticker, root):
+    # Writes everything `provider` has for `ticker` in LocalFileProvider's layout (CSV and JSON).
+    # Returns {kind: reason} for the kinds that could not be fetched, for the caller to report.
+    out = os.path.join(root, ticker)
+    os.makedirs(out, exist_ok=True)
+    values = await asyncio.gather(*(provider.fetch(ticker, k) for k in KINDS), return_exceptions=True)
+    missing = {}
+    for kind, val in zip(KINDS, values):
+        if isinstance(val, Exception) or val is None: missing[kind] = val
+        elif kind in ("info", "news"):
+            with open(os.path.join(out, f"{kind}.json"), "w") as f: json.dump(val, f, default=str)
+        else: val.to_csv(os.path.join(out, f"{kind}.csv"))
+    return missing
+
+# --- EVENT LOOP BRIDGE ---
+_loop = None
+_loop_lock = threading.Lock()
+
+def loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True, name="vip-provider-loop").start()
+        return _loop
+
+def submit(coro):
+    # A concurrent.futures.Future for `coro` running on the shared loop. Never call from the loop itself.
+    return asyncio.run_coroutine_threadsafe(coro, loop())
+
+def run(coro):
+    return submit(coro).result()
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+
+from cache import CACHE_DIR
+from llm import PRIMARY_MODEL, TEMPERATURE, topic_prompts
+
+# --- SCORE HISTORY ---
+# One row per (ticker, day, language) with every component of an analysis: topic scores and reasons,
+# the valuation multiplier, the technical verdict and the final score. Each component is stored next to
+# a fingerprint of its inputs, so a re-analysis only recomputes the components whose inputs changed:
+#   topics     scoring mode, model and the exact topic prompts (name, compacted summary, topic list,
+#              language and template), so switching mode or prompt budget scores afresh
+#   valuation  PE, 5-year min and max PE
+#   technical  date and close of the last bar
+# Topic scores that came from the backup model are never reused, so the primary gets another chance.
+SCORE_HISTORY_PATH = os.path.join(CACHE_DIR, "score_history.sqlite")
+COMPONENTS = ("topics", "valuation", "technical")
+COLUMNS = (
+    "ticker", "day", "lang", "updated", "total_qual", "mult", "pe_pos", "final_score", "grade",
+    "action", "action_reason", "trend", "rsi", "topics", "topics_backup", "fp_topics", "fp_valuation", "fp_technical",
+)
+
+def fingerprint(*parts):
+    return hashlib.sha256("\x00".join(map(repr, parts)).encode("utf-8")).hexdigest()[:16]
+
+def input_fingerprints(data, topics, lang='EN', scoring_mode="batched"):
+    # From a load_core snapshot.
+    last_bar = (int(data.dates[-1].astype("datetime64[D]").astype("int64")), round(float(data.close[-1]), 4)) if len(data.dates) else None
+    return {
+        "topics": fingerprint(scoring_mode, PRIMARY_MODEL, TEMPERATURE, *topic_prompts(data['name'], data['summary'], topics, lang, scoring_mode)),
+        "valuation": fingerprint(data['pe'], data['min_pe'], data['max_pe']),
+        "technical": fingerprint(last_bar),
+    }
+
+class ScoreHistory:
+    def __init__(self, path=SCORE_HISTORY_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " ticker TEXT, day TEXT, lang TEXT, updated REAL,"
+            " total_qual REAL, mult REAL, pe_pos REAL, final_score REAL, grade TEXT,"
+            " action TEXT, action_reason TEXT, trend TEXT, rsi REAL,"
+            " topics TEXT, topics_backup INTEGER,"
+            " fp_topics TEXT, fp_valuation TEXT, fp_technical TEXT,"
+            " PRIMARY KEY (ticker, lang, day)) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    def _rows(self, sql, params):
+        with self._lock:
+            cur = self._db.execute(sql, params)
+            names = [d[0] for d in cur.description]
+            return [dict(zip(names, r)) for r in cur.fetchall()]
+
+    def latest(self, ticker, lang):
+        # The most recent row for ticker and language, with `topics` decoded to [(score, reason)].
+        rows = self._rows("SELECT * FROM scores WHERE ticker = ? AND lang = ? ORDER BY day DESC LIMIT 1", (ticker, lang))
+        if not rows: return None
+        row = rows[0]
+        row["topics"] = [tuple(t) if t else None for t in json.loads(row["topics"])] if row["topics"] else None
+        return row
+
+    def reusable(self, row, fps):
+        # Components of `row` whose stored fingerprint matches the current inputs.
+        if row is None: return set()
+        same = {c for c in COMPONENTS if row.get(f"fp_{c}") == fps[c]}
+        if row["topics"] is None or None in row["topics"] or row["topics_backup"]: same.discard("topics")
+        return same
+
+    def record(self, ticker, lang, fps, topics=None, topics_backup=False, total_qual=None, mult=None, pe_pos=None,
+               final_score=None, grade=None, action=None, action_reason=None, trend=None, rsi=None, day=None):
+        # Today's row is overwritten by later analyses the same day. topics: [(score, reason)] in topic order.
+        row = (
+            ticker, (day or date.today()).isoformat(), lang, time.time(),
+            total_qual, mult, pe_pos, final_score, grade, action, action_reason, trend,
+            float(rsi) if rsi is not None else None,
+            json.dumps([list(t) if t else None for t in topics], ensure_ascii=False) if topics is not None else None,
+            int(bool(topics_backup)), fps["topics"], fps["valuation"], fps["technical"],
+        )
+        with self._lock:
+            self._db.execute(f"INSERT OR REPLACE INTO scores ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(row))})", row)
+            self._db.commit()
+
+    def series(self, ticker, lang=None):
+        # Daily component scores for the score-over-time chart, oldest first. Without `lang` the
+        # languages are combined (the scores are the same; only the reasons differ), latest update wins.
+        sql = "SELECT day, lang, updated, total_qual, mult, final_score FROM scores WHERE ticker = ?"
+        params = (ticker,)
+        if lang is not None:
+            sql += " AND lang = ?"
+            params += (lang,)
+        with self._lock:
+            df = pd.read_sql_query(sql + " ORDER BY day, updated", self._db, params=params)
+        if df.empty: return df
+        df = df.drop_duplicates("day", keep="last")
+        return df.set_index(pd.to_datetime(df["day"]))[["total_qual", "mult", "final_score"]]
+
+score_history = ScoreHistory()
@@ -0,0 +1,82 @@
+# --- SCORING RULES ---
+# Shared by the single-stock view and the screener so both grade a ticker the same way.
+
+QUAL_TOPICS = ["Unique Product/Moat", "Revenue Growth", "Competitive Advantage", "Profit Stability", "Management"]
+
+def normalize_ticker(raw_t, mkt):
+    final_t = raw_t
+    if mkt == "Canada (TSX)" and ".TO" not in raw_t: final_t += ".TO"
+    elif mkt == "HK (HKEX)":
+        nums = ''.join(filter(str.isdigit, raw_t))
+        final_t = f"{nums.zfill(4)}.HK" if nums else f"{raw_t}.HK"
+    return final_t
+
+def price_eps_pe(info, hist):
+    price = info.get('currentPrice', 0)
+    if price == 0 and not hist.empty: price = hist['Close'].iloc[-1]
+
+    eps = info.get('forwardEps')
+    if eps is None: eps = info.get('trailingEps')
+
+    pe = info.get('forwardPE')
+    if pe is None: pe = price / eps if (eps and eps > 0) else 0
+    return price, eps, pe
+
+def valuation_multiplier(pe, min_pe, max_pe):
+    mult = 1.0
+    pos_pct = 1.0
+    if pe and pe > 0 and max_pe > min_pe:
+        pos_pct = (pe - min_pe) / (max_pe - min_pe)
+        if pos_pct < 0.25: mult = 5.0
+        elif pos_pct < 0.50: mult = 4.0
+        elif pos_pct < 0.75: mult = 3.0
+        elif pos_pct < 1.00: mult = 2.0
+        else: mult = 1.0
+    return mult, pos_pct
+
+def qual_total(scores):
+    # Sum of the topic scores (0-4, one decimal each), rounded so float noise never reaches the display or storage.
+    return round(sum(scores), 1)
+
+def grade_key(final_score):
+    if final_score >= 75: return "grade_strong_buy"
+    elif final_score >= 60: return "grade_buy"
+    elif final_score >= 45: return "grade_hold"
+    elif final_score >= 30: return "grade_sell"
+    return "grade_avoid"
+
+# --- FALLBACK TOPIC SCORES ---
+# Deterministic stand-ins for a topic's AI score, from one info ratio each. They are used only when the
+# AI answer misses the analysis deadline. Thresholds are ascending (ratio -> score at or above it); a
+# missing ratio scores the neutral midpoint.
+HEURISTIC_RULES = {
+    "Unique Product/Moat": ("grossMargins", ((0.25, 1.5), (0.40, 2.5), (0.60, 3.5))),
+    "Revenue Growth": ("revenueGrowth", ((0.0, 1.0), (0.03, 1.5), (0.10, 2.5), (0.25, 3.5))),
+    "Competitive Advantage": ("returnOnEquity", ((0.08, 1.5), (0.15, 2.5), (0.25, 3.5))),
+    "Profit Stability": ("profitMargins", ((0.03, 1.5), (0.10, 2.5), (0.20, 3.5))),
+    "Management": ("returnOnAssets", ((0.0, 1.0), (0.05, 2.0), (0.10, 3.0))),
+}
+HEURISTIC_FLOOR, HEURISTIC_NEUTRAL = 0.5, 2.0
+
+def heuristic_topic_score(topic, info):
+    # (score, info field, value); value is None when the field is missing.
+    field, steps = HEURISTIC_RULES[topic]
+    value = info.get(field)
+    if not isinstance(value, (int, float)) or value != value: return HEURISTIC_NEUTRAL, field, None
+    score = HEURISTIC_FLOOR
+    for threshold, step_score in steps:
+        if value >= threshold: score = step_score
+    return score, field, value
+
+def technical_action(tech):
+    action_key, reason_key = "act_avoid", "reas_down"
+    if "uptrend" in tech['trend']:
+        if tech['last_price'] < tech['support'] * 1.05: action_key, reason_key = "act_buy_sup", "reas_sup"
+        elif tech['vol_ratio'] > 1.5: action_key, reason_key = "act_buy_break", "reas_vol"
+        elif tech['is_squeezing']: action_key, reason_key = "act_prep", "reas_vcp"
+        elif tech['rsi'] > 70: action_key, reason_key = "act_profit", "reas_over"
+        else: action_key, reason_key = "act_buy_hold", "reas_health"
+    else:
+        if tech['last_price'] < tech['support']: action_key, reason_key = "act_sell_sup", "reas_break_sup"
+        elif tech['rsi'] < 30: action_key, reason_key = "act_watch_oversold", "reas_oversold"
+    return action_key, reason_key
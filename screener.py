@@ -0,0 +1,117 @@
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from llm import score_topics
+from market_data import CACHE_TTL, fetch_kind, fundamentals, history_fetcher, history_store, pe_index, placed_pe, provider, statement_eps
+from providers import run
+from scoring import QUAL_TOPICS, normalize_ticker, price_eps_pe, qual_total, valuation_multiplier, grade_key, technical_action
+from technicals import WINDOW, panel_technicals, to_panel
+
+# --- SCREENER SETTINGS ---
+SCREENER_MAX_TICKERS = 1000
+SCREENER_WORKERS = 8
+DOWNLOAD_CHUNK = 100
+
+def parse_watchlist(text, mkt):
+    seen, symbols = set(), []
+    for raw_t in re.split(r"[\s,;]+", text.upper()):
+        if not raw_t: continue
+        final_t = normalize_ticker(raw_t, mkt)
+        if final_t not in seen:
+            seen.add(final_t); symbols.append(final_t)
+    return symbols
+
+async def download_chunks(requests):
+    # [(symbols, start)] -> one {sym: frame} per request, downloaded concurrently; a failed chunk is empty.
+    frames = await asyncio.gather(*(provider.history_many(chunk, start) for chunk, start in requests), return_exceptions=True)
+    return [{} if isinstance(f, Exception) else f for f in frames]
+
+def bulk_history(symbols):
+    # Brings the history store up to date with one bulk download per chunk instead of one request per symbol.
+    # New symbols get INITIAL_PERIOD; stored ones only download bars from the chunk's earliest anchor date.
+    stale = [s for s in symbols if history_store.is_stale(s, CACHE_TTL["history"])]
+    anchors = {s: history_store.anchor(s) for s in stale}
+    fresh = [s for s in stale if anchors[s] is None]
+    known = [s for s in stale if anchors[s] is not None]
+    requests = [(fresh[i:i + DOWNLOAD_CHUNK], None) for i in range(0, len(fresh), DOWNLOAD_CHUNK)]
+    for i in range(0, len(known), DOWNLOAD_CHUNK):
+        chunk = known[i:i + DOWNLOAD_CHUNK]
+        requests.append((chunk, min(anchors[s] for s in chunk)))
+
+    for (chunk, start), downloaded in zip(requests, run(download_chunks(requests))):
+        for sym in chunk:
+            if start is None:
+                if sym not in downloaded: continue
+                try: history_store.refresh(sym, lambda start, df=downloaded[sym]: df, CACHE_TTL["history"])
+                except: pass
+                continue
+            # A re-based series (split/dividend) asks for start=None and falls back to a full per-ticker fetch.
+            bulk_fetch = lambda start, df=downloaded.get(sym), sym=sym: df if start is not None else history_fetcher(sym)(None)
+            try: history_store.refresh(sym, bulk_fetch, CACHE_TTL["history"])
+            except: pass
+
+    return {sym: history_store.frame(sym, tail=WINDOW) for sym in symbols if history_store.meta(sym)}
+
+def score_ticker(client, sym, hist, tech, lang='EN', use_ai=False, scoring_mode="batched"):
+    info = fetch_kind(sym, "info")
+    if not info: return None
+    # The screener never builds a core snapshot, so it records the fundamentals row itself.
+    try: fundamentals.record(sym, info)
+    except Exception: pass
+
+    price, eps, pe = price_eps_pe(info, hist)
+    q_eps = statement_eps(sym)
+    idx = pe_index(sym, q_eps, eps)
+    eps, pe = placed_pe(price, eps, pe, idx, q_eps)
+    min_pe, max_pe = idx.min, idx.max
+    mult, pos_pct = valuation_multiplier(pe, min_pe, max_pe)
+
+    action_key, trend, rsi = None, None, None
+    if tech:
+        action_key, _ = technical_action(tech)
+        trend, rsi = tech['trend'], tech['rsi']
+
+    # Without AI, only answers already in the LLM cache count; a ticker missing any topic gets no final score.
+    name = info.get('longName', sym)
+    summary = info.get('longBusinessSummary', 'No summary available.')
+    scored = score_topics(client, name, summary, QUAL_TOPICS, lang, scoring_mode, cache_only=not use_ai)
+    total_qual = None if None in scored else qual_total(t[0] for t in scored)
+    final_score = round(total_qual * mult, 1) if total_qual is not None else None
+
+    return {
+        "ticker": sym, "name": name, "price": price, "pe": pe if pe and pe > 0 else None,
+        "min_pe": min_pe, "max_pe": max_pe, "pe_pos": pos_pct * 100, "mult": mult,
+        "trend": trend, "rsi": rsi, "action": action_key,
+        "qual": total_qual, "final_score": final_score,
+        "grade": grade_key(final_score) if final_score is not None else None,
+    }
+
+def run_screener(client, symbols, lang='EN', use_ai=False, on_progress=None, scoring_mode="batched"):
+    # on_progress(done, total) is called from the calling thread, so it may update Streamlit widgets.
+    symbols = symbols[:SCREENER_MAX_TICKERS]
+    frames = bulk_history(symbols)
+    rows, total = [], len(symbols)
+    done = total - len(frames)
+    if on_progress: on_progress(done, total)
+
+    # Technicals for the whole watchlist in one vectorized pass
+    techs = {}
+    if frames:
+        panel = to_panel(frames)
+        techs = panel_technicals(panel['Close'], panel['High'], panel['Low'], panel['Volume']).to_dict('index')
+
+    with ThreadPoolExecutor(max_workers=SCREENER_WORKERS) as pool:
+        futures = [pool.submit(score_ticker, client, sym, hist, techs.get(sym), lang, use_ai, scoring_mode) for sym, hist in frames.items()]
+        for fut in as_completed(futures):
+            try: row = fut.result()
+            except: row = None
+            if row: rows.append(row)
+            done += 1
+            if on_progress: on_progress(done, total)
+
+    df = pd.DataFrame(rows)
+    if not df.empty: df = df.sort_values(["final_score", "mult"], ascending=False, na_position="last").reset_index(drop=True)
+    return df
@@ -0,0 +1,51 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# --- PER-SESSION ANALYSIS RESULTS ---
+# Streamlit re-runs app.py on every interaction; finished analyses are kept here (one store per
+# session, in st.session_state) so reruns and the language toggle redraw instead of fetching again.
+# Language-independent results (market data, technicals, topic scores) are stored once per ticker;
+# LLM text is stored per language under the same ticker, so evicting a ticker drops both.
+SESSION_MAX_TICKERS = 8
+
+class SessionResults:
+    def __init__(self, max_tickers=SESSION_MAX_TICKERS):
+        self.max_tickers = max_tickers
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # ticker -> {"numeric": dict | None, "text": {lang: dict}}
+
+    def _entry(self, ticker):
+        entry = self._entries.get(ticker)
+        if entry is not None: self._entries.move_to_end(ticker)
+        return entry
+
+    def numeric(self, ticker):
+        with self._lock:
+            entry = self._entry(ticker)
+            return entry["numeric"] if entry else None
+
+    def text(self, ticker, lang):
+        with self._lock:
+            entry = self._entry(ticker)
+            return entry["text"].get(lang) if entry else None
+
+    def put(self, ticker, lang, numeric, text):
+        # A fresh numeric result invalidates text written against the old numbers.
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is None or entry["numeric"] is not numeric:
+                entry = {"numeric": numeric, "text": {}}
+                self._entries[ticker] = entry
+            entry["text"][lang] = text
+            self._entries.move_to_end(ticker)
+            while len(self._entries) > self.max_tickers: self._entries.popitem(last=False)
+
+    def discard(self, ticker):
+        with self._lock: self._entries.pop(ticker, None)
+
+def resolved(value):
+    # A finished Future, so stored results go through the same render loop as live ones.
+    fut = Future()
+    fut.set_result(value)
+    return fut
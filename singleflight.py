@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+# --- REQUEST COALESCING ---
+# The first caller for a key runs the work; callers arriving while it is in flight wait on the same
+# Future and share its result (or exception). Nothing is remembered once the call finishes — caching
+# stays the job of DiskCache. Groups are module-level so every session in the process shares them.
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.calls = 0
+        self.deduped = 0
+
+    def _join(self, key):
+        # (future, True if this caller runs the work).
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is None:
+                fut = self._inflight[key] = Future()
+                self.calls += 1
+                return fut, True
+            self.deduped += 1
+            return fut, False
+
+    def do(self, key, fn):
+        fut, leader = self._join(key)
+        if not leader: return fut.result()
+        try:
+            result = fn()
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock: self._inflight.pop(key, None)
+
+    async def do_async(self, key, fn):
+        # do() for coroutine functions, sharing keys with do(): callers on the event loop await the
+        # in-flight Future instead of blocking the loop.
+        fut, leader = self._join(key)
+        if not leader: return await asyncio.wrap_future(fut)
+        try:
+            result = await fn()
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock: self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "deduped": self.deduped, "inflight": len(self._inflight)}
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+def group(name):
+    with _groups_lock: return _groups.setdefault(name, SingleFlight(name))
+
+def stats():
+    with _groups_lock: return {name: g.stats() for name, g in _groups.items()}
@@ -0,0 +1,98 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from technicals import calculate_technicals
+
+# --- SHARED MARKET SNAPSHOTS ---
+# load_core returns one immutable MarketSnapshot per ticker and input fingerprint, shared by every session
+# that analyses it, instead of a fresh dict (full info, float64 OHLCV frame) per call. Bars are float32,
+# only the columns the app reads, and read-only so no session can change another's data.
+SNAPSHOT_BUDGET_MB = int(os.environ.get("VIP_SNAPSHOT_BUDGET_MB", "64"))
+BAR_COLUMNS = ("Close", "High", "Low", "Volume")
+# The info fields the app reads (Value and Financials tabs, prompts); the rest of yfinance's info is dropped.
+INFO_FIELDS = (
+    "currentPrice", "forwardEps", "trailingEps", "forwardPE", "trailingPE", "pegRatio", "priceToBook",
+    "priceToSalesTrailing12Months", "marketCap", "enterpriseValue", "totalRevenue", "revenueGrowth",
+    "grossMargins", "profitMargins", "returnOnAssets", "returnOnEquity", "dividendYield", "beta",
+    "targetMeanPrice", "lastFiscalYearEnd",
+)
+FIELDS = ("ticker", "price", "currency", "pe", "eps", "min_pe", "max_pe", "pe_pct", "pe_basis", "pe_years",
+          "name", "industry", "summary", "raw_info")
+
+def read_only(a):
+    a.setflags(write=False)
+    return a
+
+class MarketSnapshot:
+    __slots__ = FIELDS + ("dates", "close", "high", "low", "volume", "fingerprint", "nbytes", "_tech")
+
+    def __init__(self, fields, hist, fingerprint=None):
+        for f in FIELDS: setattr(self, f, fields.get(f))
+        self.raw_info = {k: self.raw_info.get(k) for k in INFO_FIELDS} if self.raw_info else {}
+        self.dates = read_only(hist.index.values.astype("datetime64[ns]"))
+        self.close, self.high, self.low, self.volume = (read_only(hist[c].to_numpy(np.float32)) for c in BAR_COLUMNS)
+        self.fingerprint = fingerprint
+        self._tech = None
+        self.nbytes = (
+            self.dates.nbytes + 4 * self.close.nbytes + len(self.summary or "") + 64 * len(self.raw_info)
+        )
+
+    # Mapping-style access, so snapshots drop in where load_core used to return a dict.
+    def __getitem__(self, key):
+        if key not in FIELDS and key != "history": raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return self[key] if key in FIELDS or key == "history" else default
+
+    def keys(self):
+        return FIELDS + ("history",)
+
+    @property
+    def history(self):
+        # A DataFrame over the shared arrays; calculate_technicals copies what it modifies.
+        return pd.DataFrame(
+            {"Close": self.close, "High": self.high, "Low": self.low, "Volume": self.volume},
+            index=pd.DatetimeIndex(self.dates, name="Date"), copy=False,
+        )
+
+    def technicals(self):
+        # Computed once per snapshot and shared; a race just computes the same result twice.
+        if self._tech is None: self._tech = calculate_technicals(self.history)
+        return self._tech
+
+class SnapshotCache:
+    # Most recent snapshot per ticker, evicting least recently used tickers beyond `budget_bytes`.
+    # Sessions that still hold an evicted snapshot keep it alive until they drop it.
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.bytes = 0
+
+    def get(self, ticker, fingerprint):
+        with self._lock:
+            snap = self._entries.get(ticker)
+            if snap is None or snap.fingerprint != fingerprint: return None
+            self._entries.move_to_end(ticker)
+            return snap
+
+    def put(self, ticker, snap):
+        with self._lock:
+            old = self._entries.pop(ticker, None)
+            if old is not None: self.bytes -= old.nbytes
+            self._entries[ticker] = snap
+            self.bytes += snap.nbytes
+            while self.bytes > self.budget_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+        return snap
+
+    def stats(self):
+        with self._lock: return {"entries": len(self._entries), "bytes": self.bytes}
+
+snapshots = SnapshotCache(SNAPSHOT_BUDGET_MB * 1024 * 1024)
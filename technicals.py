@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+MIN_BARS = 200
+WINDOW = 300
+
+def calculate_technicals(df):
+    if df.empty or len(df) < MIN_BARS: return None
+    df_recent = df.tail(WINDOW).copy()
+    df_recent['SMA_50'] = df_recent['Close'].rolling(window=50).mean()
+    df_recent['SMA_200'] = df_recent['Close'].rolling(window=200).mean()
+    
+    delta = df_recent['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    df_recent['RSI'] = 100 - (100 / (1 + rs))
+    
+    avg_vol = df_recent['Volume'].rolling(window=20).mean().iloc[-1]
+    curr_vol = df_recent['Volume'].iloc[-1]
+    vol_ratio = curr_vol / avg_vol if avg_vol > 0 else 1.0
+    
+    recent_60 = df_recent.tail(60)
+    support = recent_60['Low'].min()
+    resistance = recent_60['High'].max()
+    
+    vol_short = df_recent['Close'].rolling(window=10).std().iloc[-1]
+    vol_long = df_recent['Close'].rolling(window=60).std().iloc[-1]
+    is_squeezing = vol_short < (vol_long * 0.5)
+    
+    curr_price = df_recent['Close'].iloc[-1]
+    sma_50 = df_recent['SMA_50'].iloc[-1]
+    sma_200 = df_recent['SMA_200'].iloc[-1]
+    
+    trend = "neutral"
+    if curr_price > sma_200:
+        trend = "uptrend" if curr_price > sma_50 else "weak_uptrend"
+    else:
+        trend = "downtrend"
+        
+    return {
+        "trend": trend, "rsi": df_recent['RSI'].iloc[-1], 
+        "support": support, "resistance": resistance,
+        "vol_ratio": vol_ratio, "is_squeezing": is_squeezing,
+        "last_price": curr_price, "data": df_recent 
+    }
+
+# --- VECTORIZED PANEL ENGINE ---
+# Same indicators as calculate_technicals, computed for many tickers at once on (bars x tickers) arrays.
+
+def rolling_mean(a, w):
+    # Row t holds the mean of rows t-w+1..t; NaN until a full window of valid values is available.
+    valid = ~np.isnan(a)
+    c = np.zeros((a.shape[0] + 1,) + a.shape[1:])
+    n = np.zeros((a.shape[0] + 1,) + a.shape[1:], dtype=np.int64)
+    np.cumsum(np.where(valid, a, 0.0), axis=0, out=c[1:])
+    np.cumsum(valid, axis=0, out=n[1:])
+    out = np.full(a.shape, np.nan)
+    if a.shape[0] < w: return out
+    full = (n[w:] - n[:-w]) == w
+    out[w - 1:] = np.where(full, (c[w:] - c[:-w]) / w, np.nan)
+    return out
+
+def rolling_std(a, w):
+    # Sample std (ddof=1) from windowed sums of x and x^2; columns are demeaned first to limit cancellation.
+    with np.errstate(invalid="ignore"):
+        x = a - np.nanmean(a, axis=0)
+    m1 = rolling_mean(x, w)
+    m2 = rolling_mean(x * x, w)
+    var = np.maximum((m2 - m1 * m1) * w / (w - 1), 0.0)
+    return np.sqrt(var)
+
+def rolling_extreme(a, w, fn):
+    out = np.full(a.shape, np.nan)
+    if a.shape[0] < w: return out
+    out[w - 1:] = fn(sliding_window_view(a, w, axis=0), axis=-1)
+    return out
+
+def indicator_series(close, high, low, volume):
+    delta = np.diff(close, axis=0, prepend=np.nan)
+    started = ~np.isnan(close)
+    gain = np.where(started, np.where(delta > 0, delta, 0.0), np.nan)
+    loss = np.where(started, np.where(delta < 0, -delta, 0.0), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = rolling_mean(gain, 14) / rolling_mean(loss, 14)
+        rsi = 100 - (100 / (1 + rs))
+    return {
+        "sma_50": rolling_mean(close, 50), "sma_200": rolling_mean(close, 200), "rsi": rsi,
+        "avg_vol": rolling_mean(volume, 20), "std_10": rolling_std(close, 10), "std_60": rolling_std(close, 60),
+        "support": rolling_extreme(low, 60, np.min), "resistance": rolling_extreme(high, 60, np.max),
+    }
+
+def right_align(close, *others):
+    # Pack each ticker's valid bars at the bottom so row -1 is every ticker's latest bar, even when
+    # calendars differ (e.g. TSX vs HKEX holidays leave NaN gaps in a wide frame).
+    order = np.argsort(~np.isnan(close), axis=0, kind="stable")
+    return [np.take_along_axis(a, order, axis=0) for a in (close,) + others]
+
+def to_panel(frames):
+    # {ticker: OHLCV DataFrame} -> wide Close/High/Low/Volume DataFrames (dates x tickers).
+    # Indexes are reduced to naive local dates so exchanges in different time zones share rows.
+    frames = {sym: df.set_axis(df.index.tz_localize(None).normalize() if df.index.tz is not None else df.index.normalize()) for sym, df in frames.items()}
+    return {col: pd.DataFrame({sym: df[col] for sym, df in frames.items()}) for col in ("Close", "High", "Low", "Volume")}
+
+def panel_technicals(close, high, low, volume, tickers=None):
+    # Accepts wide DataFrames or 2-D arrays; returns one row per ticker with at least MIN_BARS bars.
+    if tickers is None: tickers = list(close.columns) if isinstance(close, pd.DataFrame) else list(range(np.shape(close)[1]))
+    c, h, l, v = right_align(*(np.asarray(x, dtype=np.float64) for x in (close, high, low, volume)))
+    n_bars = (~np.isnan(c)).sum(axis=0)
+    c, h, l, v = c[-WINDOW:], h[-WINDOW:], l[-WINDOW:], v[-WINDOW:]
+    ind = {k: a[-1] for k, a in indicator_series(c, h, l, v).items()}
+
+    price = c[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol_ratio = np.where(ind["avg_vol"] > 0, v[-1] / ind["avg_vol"], 1.0)
+        is_squeezing = ind["std_10"] < (ind["std_60"] * 0.5)
+        trend = np.where(price > ind["sma_200"], np.where(price > ind["sma_50"], "uptrend", "weak_uptrend"), "downtrend")
+
+    df = pd.DataFrame({
+        "trend": trend, "rsi": ind["rsi"],
+        "support": ind["support"], "resistance": ind["resistance"],
+        "vol_ratio": vol_ratio, "is_squeezing": is_squeezing,
+        "last_price": price, "sma_50": ind["sma_50"], "sma_200": ind["sma_200"],
+    }, index=pd.Index(tickers, name="ticker"))
+    return df[n_bars >= MIN_BARS]
@@ -0,0 +1,159 @@
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from analysis import earnings_context, valuation_context
+from groq_client import get_client, limiter
+from llm import PRIMARY_MODEL, analyze_qualitative, score_topics
+from market_data import load_core, load_financials, load_news
+from perf import span
+from scoring import QUAL_TOPICS
+
+# --- BACKGROUND CACHE WARMER ---
+# Refreshes market data and LLM answers for a watchlist shortly after each exchange closes, writing into
+# the same disk caches the app reads, so the first interactive analysis of the day starts warm.
+# Runs as a daemon thread in the Streamlit server (VIP_WARM_IN_SERVER=1) or on its own:
+#   python -m warmer [--once] [TICKER ...]
+# Tickers use the app's normalized form (RY.TO, 0700.HK). ValuationSummary prompts include the current
+# price, so those answers only hit if the price has not moved since the warm run.
+WARM_IN_SERVER = os.environ.get("VIP_WARM_IN_SERVER") == "1"
+WARM_WATCHLIST = os.environ.get("VIP_WARM_WATCHLIST", "")
+WARM_LANGS = os.environ.get("VIP_WARM_LANGS", "EN")
+WARM_SCORING_MODE = os.environ.get("VIP_WARM_SCORING_MODE", "batched")
+WARM_DELAY_MIN = int(os.environ.get("VIP_WARM_DELAY_MIN", "30"))  # minutes after the close
+# The warmer only starts a ticker while the primary model has at least this share of its budget left,
+# leaving the rest for interactive sessions.
+WARM_MIN_HEADROOM = float(os.environ.get("VIP_WARM_MIN_HEADROOM", "0.5"))
+
+# Exchange -> (timezone, closing time).
+MARKET_CLOSES = {
+    "US": ("America/New_York", (16, 0)),
+    "TSX": ("America/Toronto", (16, 0)),
+    "HKEX": ("Asia/Hong_Kong", (16, 10)),
+}
+
+def market_of(ticker):
+    if ticker.endswith(".TO"): return "TSX"
+    if ticker.endswith(".HK"): return "HKEX"
+    return "US"
+
+def parse_tickers(text):
+    return [t for t in re.split(r"[\s,;]+", text.upper()) if t]
+
+def next_run(market, now=None):
+    # Next weekday close plus WARM_DELAY_MIN, as an aware datetime. Exchange holidays are not modelled;
+    # a run on a holiday just refreshes the previous session's data.
+    tz_name, (hour, minute) = MARKET_CLOSES[market]
+    tz = ZoneInfo(tz_name)
+    now = (now or datetime.now(tz)).astimezone(tz)
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0) + timedelta(minutes=WARM_DELAY_MIN)
+    while run <= now or run.weekday() >= 5: run += timedelta(days=1)
+    return run
+
+def wait_for_headroom(stop, max_wait=600):
+    deadline = time.monotonic() + max_wait
+    while limiter(PRIMARY_MODEL).headroom() < WARM_MIN_HEADROOM and time.monotonic() < deadline:
+        if stop.wait(1.0): return False
+    return not stop.is_set()
+
+def warm_ticker(client, ticker, langs, scoring_mode=WARM_SCORING_MODE):
+    # Same loads and prompts as an interactive analysis. Returns False if the ticker has no data.
+    with span("warm.ticker", ticker=ticker):
+        data = load_core(ticker)
+        if not data: return False
+        load_financials(ticker)
+        news_data = load_news(ticker)
+        val_context = valuation_context(data)
+        earn_context = earnings_context(news_data)['prompt_context']
+        for lang in langs:
+            score_topics(client, data['name'], data['summary'], QUAL_TOPICS, lang, scoring_mode)
+            analyze_qualitative(client, data['name'], val_context, "ValuationSummary", lang)
+            analyze_qualitative(client, data['name'], earn_context, "EarningsSummary", lang)
+    return True
+
+def warm(client, tickers, langs, stop=None):
+    # One ticker at a time, each only once the shared Groq budget has headroom.
+    stop = stop or threading.Event()
+    warmed = 0
+    for ticker in tickers:
+        if not wait_for_headroom(stop): break
+        try: warmed += warm_ticker(client, ticker, langs)
+        except Exception as e: print(f"warmer: {ticker} failed: {e}", file=sys.stderr)
+    return warmed
+
+class Warmer:
+    def __init__(self, client, tickers, langs):
+        self.client, self.tickers, self.langs = client, tickers, langs
+        self.stop = threading.Event()
+        self.thread = None
+        # Each market's next scheduled run. It advances from the run it replaces, never from the time a
+        # warm finished, so markets closing together (US and TSX) or during another market's warm still run.
+        self.due = {m: next_run(m) for m in {market_of(t) for t in tickers}}
+
+    def schedule(self):
+        # [(run_at, market)] for every market on the watchlist, earliest first.
+        return sorted((run_at, m) for m, run_at in self.due.items())
+
+    def advance(self, market, now):
+        # A run missed entirely (the process was suspended past the next one) is skipped, not replayed.
+        run_at = next_run(market, self.due[market])
+        self.due[market] = run_at if run_at > now else next_run(market, now)
+
+    def run_forever(self):
+        while not self.stop.is_set():
+            run_at, _ = self.schedule()[0]
+            if self.stop.wait(max(0.0, (run_at - datetime.now(run_at.tzinfo)).total_seconds())): break
+            now = datetime.now(run_at.tzinfo)
+            for run_at, market in self.schedule():
+                if run_at > now: break
+                warm(self.client, [t for t in self.tickers if market_of(t) == market], self.langs, self.stop)
+                self.advance(market, now)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run_forever, daemon=True, name="vip-warmer")
+            self.thread.start()
+        return self
+
+_warmer = None
+_lock = threading.Lock()
+
+def start_background(api_key, tickers=None, langs=None):
+    # Idempotent: Streamlit re-runs app.py, but the module (and so the one warmer thread) persists.
+    global _warmer
+    tickers = tickers if tickers is not None else parse_tickers(WARM_WATCHLIST)
+    if not tickers: return None
+    with _lock:
+        if _warmer is None:
+            _warmer = Warmer(get_client(api_key), tickers, langs or parse_tickers(WARM_LANGS)).start()
+        return _warmer
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm the market data and LLM caches for a watchlist after each market close.")
+    parser.add_argument("tickers", nargs="*", help="defaults to VIP_WARM_WATCHLIST")
+    parser.add_argument("--once", action="store_true", help="warm every ticker now and exit")
+    parser.add_argument("--langs", default=WARM_LANGS)
+    args = parser.parse_args(argv)
+
+    api_key = os.environ.get("GROQ_API_KEY")
+    if not api_key: parser.error("GROQ_API_KEY is not set")
+    tickers = args.tickers or parse_tickers(WARM_WATCHLIST)
+    if not tickers: parser.error("no tickers given and VIP_WARM_WATCHLIST is empty")
+    langs = parse_tickers(args.langs)
+
+    if args.once:
+        print(f"warmed {warm(get_client(api_key), tickers, langs)}/{len(tickers)} tickers")
+        return 0
+    w = Warmer(get_client(api_key), tickers, langs)
+    for run_at, market in w.schedule(): print(f"{market}: next run {run_at:%Y-%m-%d %H:%M %Z}")
+    try: w.run_forever()
+    except KeyboardInterrupt: pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())